@@ -0,0 +1,93 @@
+"""Run the bot as several processes, each owning a range of shards, sharing one SQLite store.
+
+    python cluster.py --processes 4 --shards 16
+
+Every process gets SHARDING=on, SHARD_COUNT, SHARD_IDS, CLUSTER_ID, CLUSTER_STORE and its own PORT.
+Processes that exit are restarted with a growing delay.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+RESTART_DELAY = 5
+MAX_RESTART_DELAY = 300
+
+
+def shard_ranges(shard_count, processes):
+    """Split shard IDs into contiguous ranges, one per process"""
+    per_process, extra = divmod(shard_count, processes)
+    ranges = []
+    start = 0
+    for index in range(processes):
+        end = start + per_process + (1 if index < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return [shard_ids for shard_ids in ranges if shard_ids]
+
+
+def start_process(cluster_id, shard_ids, args):
+    env = dict(os.environ)
+    env.update({
+        'SHARDING': 'on',
+        'SHARD_COUNT': str(args.shards),
+        'SHARD_IDS': ','.join(str(shard_id) for shard_id in shard_ids),
+        'CLUSTER_ID': str(cluster_id),
+        'CLUSTER_STORE': args.store,
+        'PORT': str(args.port + cluster_id),
+    })
+    print(f"Starting cluster {cluster_id} with shards {shard_ids[0]}-{shard_ids[-1]}")
+    return subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')], env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the bot as a cluster of shard-owning processes")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--shards', type=int, default=None, help="total shard count (defaults to one per process)")
+    parser.add_argument('--store', default='cluster.db', help="SQLite file shared by all processes")
+    parser.add_argument('--port', type=int, default=8080, help="first keep-alive port, each process uses the next one")
+    args = parser.parse_args()
+    args.shards = args.shards or args.processes
+
+    ranges = shard_ranges(args.shards, args.processes)
+    processes = {cluster_id: start_process(cluster_id, shard_ids, args) for cluster_id, shard_ids in enumerate(ranges)}
+    restart_delays = {cluster_id: RESTART_DELAY for cluster_id in processes}
+    restart_at = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while not stopping:
+        now = time.time()
+        for cluster_id, process in processes.items():
+            if cluster_id in restart_at:
+                if now >= restart_at[cluster_id]:
+                    del restart_at[cluster_id]
+                    processes[cluster_id] = start_process(cluster_id, ranges[cluster_id], args)
+            elif process.poll() is not None:
+                delay = restart_delays[cluster_id]
+                print(f"Cluster {cluster_id} exited with code {process.returncode}, restarting in {delay}s")
+                restart_at[cluster_id] = now + delay
+                restart_delays[cluster_id] = min(delay * 2, MAX_RESTART_DELAY)
+        time.sleep(1)
+
+    print("Stopping cluster...")
+    for process in processes.values():
+        if process.poll() is None:
+            process.terminate()
+    for process in processes.values():
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,52 @@
-from flask import Flask
-from threading import Thread
+from aiohttp import web
+import math
+import time
 
-app = Flask('')
+READY_MAX_LATENCY = 5  # seconds of heartbeat latency before the bot reports not ready
 
-@app.route('/')
-def home():
-    return "Botul merge!"
+started_at = time.time()
 
-def run():
-    app.run(host='0.0.0.0', port=8080)
+def get_latencies(bot):
+    latencies = getattr(bot, 'latencies', None)
+    return dict(latencies) if latencies is not None else {0: bot.latency}
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
-  
+async def home(request):
+    return web.Response(text="Botul merge!")
+
+async def healthz(request):
+    """Liveness: the event loop is running and answering requests"""
+    return web.json_response({'status': 'ok', 'uptime': round(time.time() - started_at, 1)})
+
+async def readyz(request):
+    """Readiness: logged in, connected to the gateway and the heartbeat latency is sane"""
+    bot = request.app['bot']
+    latencies = get_latencies(bot)
+    ready = bot.is_ready() and not bot.is_closed() and all(
+        math.isfinite(latency) and latency < READY_MAX_LATENCY for latency in latencies.values()
+    )
+    body = {
+        'ready': ready,
+        'guilds': len(bot.guilds),
+        'latency_ms': {str(shard_id): round(latency * 1000, 1) if math.isfinite(latency) else None for shard_id, latency in latencies.items()},
+    }
+    return web.json_response(body, status=200 if ready else 503)
+
+async def metrics(request):
+    """Metrics in the Prometheus text format"""
+    lines = request.app['metrics']()
+    return web.Response(text='\n'.join(lines) + '\n', content_type='text/plain')
+
+async def keep_alive(bot, metrics_provider, port=8080):
+    """Start the HTTP server on the bot's event loop, returns the runner so it can be cleaned up"""
+    app = web.Application()
+    app['bot'] = bot
+    app['metrics'] = metrics_provider
+    app.router.add_get('/', home)
+    app.router.add_get('/healthz', healthz)
+    app.router.add_get('/readyz', readyz)
+    app.router.add_get('/metrics', metrics)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', port).start()
+    return runner
@@ -7,30 +7,149 @@ import json
 from datetime import datetime, timedelta
 import re
 import time
+import heapq
+import sys
+import threading
+import traceback
+import cProfile
+import pstats
+import tracemalloc
+import bisect
+import functools
+import hashlib
+import sqlite3
+import queue
+import atexit
+from collections import OrderedDict, deque
 from keep_alive import keep_alive
 
+STARTUP_STARTED = time.perf_counter()
+
 # Bot setup
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+
+# Member cache policy: 'full' chunks every guild, 'limit' only chunks guilds up to MEMBER_CACHE_GUILD_LIMIT
+# members, 'data' never chunks; guilds that aren't chunked only load members the bot has data for
+MEMBER_CACHE_MODE = os.getenv('MEMBER_CACHE', 'full').lower()
+MEMBER_CACHE_GUILD_LIMIT = int(os.getenv('MEMBER_CACHE_GUILD_LIMIT', '5000'))
+
+# SHARDING=on runs one gateway connection per shard, SHARD_COUNT overrides the count Discord recommends
+SHARDING = os.getenv('SHARDING', 'off').lower() in ('1', 'on', 'true', 'auto')
+SHARD_COUNT = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+# Cluster mode (see cluster.py): SHARD_IDS limits this process to some shards, CLUSTER_STORE is the SQLite file all processes share
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv('SHARD_IDS', '').split(',') if shard_id.strip()] or None
+CLUSTER_ID = os.getenv('CLUSTER_ID')
+CLUSTER_STORE = os.getenv('CLUSTER_STORE')
+if SHARDING:
+    bot = commands.AutoShardedBot(command_prefix='!', intents=intents, chunk_guilds_at_startup=MEMBER_CACHE_MODE == 'full', shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+else:
+    bot = commands.Bot(command_prefix='!', intents=intents, chunk_guilds_at_startup=MEMBER_CACHE_MODE == 'full')
+
+# Instrumentation: METRICS=off turns timing into a no-op, decorated functions are then left unwrapped
+METRICS_ENABLED = os.getenv('METRICS', 'on').lower() not in ('0', 'off', 'false')
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # upper bounds in seconds
+
+class Histogram:
+    """Fixed-bucket latency histogram, the last bucket counts everything slower than LATENCY_BUCKETS[-1]"""
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of observations"""
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else float('inf')
+        return float('inf')
+
+histograms = {}  # {name: Histogram}
+counters = {}  # {name: count}
+
+def observe(name, seconds):
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = Histogram()
+    histogram.observe(seconds)
+
+def bump_counter(name, amount=1):
+    if METRICS_ENABLED:
+        counters[name] = counters.get(name, 0) + amount
+
+def timed(name):
+    """Record how long each call of the decorated function or coroutine takes"""
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    observe(name, time.perf_counter() - started)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    observe(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+if METRICS_ENABLED:
+    @bot.before_invoke
+    async def start_command_timer(ctx):
+        ctx.started_at = time.perf_counter()
+
+    @bot.after_invoke
+    async def stop_command_timer(ctx):
+        observe(f"command.{ctx.command.qualified_name}", time.perf_counter() - ctx.started_at)
 
 # Global variables for combined functionality
 tournaments = {}  # {guild_id: Tournament}
 sp_data = {}  # {guild_id: {user_id: sp_amount}}
 role_permissions = {}  # {guild_id: {'htr': [role_ids], 'adr': [role_ids], 'tlr': [role_ids]}}
-teams = {}  # {guild_id: {team_id: [player1, player2]}}
-team_invitations = {}  # {guild_id: {user_id: [inviter_id1, inviter_id2, ...]}}
+teams = {}  # {guild_id: {team_id: [user_id1, user_id2]}}
+team_invitations = {}  # {guild_id: {user_id: {inviter_id: expires_at}}}
+invitation_expiry_heap = []  # [(expires_at, guild_id, user_id, inviter_id)] min-heap for reaping invitations
 player_teams = {}  # {guild_id: {user_id: team_id}}
+team_counters = {}  # {guild_id: last_team_number} so team IDs are never reused
 log_channels = {}  # {guild_id: channel_id}
 bracket_roles = {}  # {guild_id: {user_id: [emoji1, emoji2, ...]}}
-logs_channels = {}  # {guild_id: channel_id} for !logs command
-logs_messages = {}  # {guild_id: message_id} to track auto-updating messages
+bot_messages = None  # {guild_id: {kind: {'channel': channel_id, 'messages': [message_id, ...]}}} from bot_messages.json, loaded on first use
+bot_messages_locks = {}  # {(guild_id, kind): asyncio.Lock}
+logs_updates = {}  # {guild_id: asyncio.Task} scheduled logs board updates that haven't started yet
 active_games = {}  # {guild_id: {'number': int, 'range': [min, max], 'channel_id': int}}
 host_registrations = {'active': False, 'hosters': [], 'max_hosters': 10}
+sp_rankings = {}  # {guild_id: {user_id: rank}} cached SP leaderboard positions, rebuilt when SP changes
+ratings = {}  # {guild_id: {user_id: [rating, matches_played]}}
+player_stats = {}  # {guild_id: {user_id: [wins, losses, podiums, titles]}}
+permission_cache = {}  # {guild_id: {'staff': frozenset(role_ids), 'htr': ..., 'adr': ..., 'tlr': ...}}
 
 # Tournament class
 class Tournament:
+    __slots__ = (
+        'players', 'max_players', 'active', 'channel', 'target_channel', 'message', 'rounds', 'results',
+        'eliminated', 'fake_count', 'map', 'abilities', 'prize', 'title', 'mode', 'seeding', 'match_log'
+    )
+
     def __init__(self):
         self.players = []
         self.max_players = 0
@@ -47,19 +166,49 @@ class Tournament:
         self.prize = ""
         self.title = ""
         self.mode = "1v1"
+        self.seeding = "random"
+        self.match_log = []  # [[round_number, winner_ids, loser_ids], ...]
 
-# Fake player class for tournaments
-class FakePlayer:
-    def __init__(self, name, user_id):
-        self.display_name = name
-        self.name = name
-        self.nick = name
+# Tournament participant record, display data is looked up from the member cache when rendering
+class Participant:
+    __slots__ = ('id',)
+
+    def __init__(self, user_id):
         self.id = user_id
-        self.mention = f"@{user_id}"
+
+    def __eq__(self, other):
+        return isinstance(other, Participant) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
 
     def __str__(self):
         return self.mention
 
+# Fake player class for tournaments
+class FakePlayer(Participant):
+    __slots__ = ('display_name',)
+
+    def __init__(self, name, user_id):
+        super().__init__(user_id)
+        self.display_name = name
+
+    @property
+    def name(self):
+        return self.display_name
+
+    @property
+    def nick(self):
+        return self.display_name
+
+    @property
+    def mention(self):
+        return f"@{self.id}"
+
 def get_tournament(guild_id):
     """Get tournament for specific guild"""
     if guild_id not in tournaments:
@@ -69,6 +218,9 @@ def get_tournament(guild_id):
 # JSON Database functions
 def init_db():
     """Initialize JSON database files"""
+    if shared_store:
+        return
+    
     db_files = {
         'warnings.json': [],
         'user_levels.json': {},
@@ -85,45 +237,376 @@ def init_db():
             with open(filename, 'w') as f:
                 json.dump(default_data, f)
 
+@timed('storage.load_json')
 def load_json(filename):
     """Load data from JSON file"""
+    if shared_store:
+        return shared_store.load(filename, [] if filename in ('warnings.json', 'tickets.json') else {})
     try:
         with open(filename, 'r') as f:
             return json.load(f)
     except (FileNotFoundError, json.JSONDecodeError):
         return {} if filename != 'warnings.json' and filename != 'tickets.json' else []
 
+@timed('storage.save_json')
 def save_json(filename, data):
     """Save data to JSON file"""
+    if shared_store:
+        shared_store.save(filename, data)
+        return
     with open(filename, 'w') as f:
         json.dump(data, f, indent=2)
 
+# Cluster storage
+CLUSTER_POLL_INTERVAL = 5  # seconds between checks for rows other processes changed
+CLUSTER_BUSY_TIMEOUT = 0.1  # seconds SQLite waits on another process's lock before giving up
+CLUSTER_RETRY_DELAY = 0.05  # first backoff after a locked database, doubles on each retry
+CLUSTER_MAX_RETRY_DELAY = 2
+
+def owns_guild(guild_id):
+    """Check if this process handles a guild's events (always true outside cluster mode)"""
+    shard_ids = getattr(bot, 'shard_ids', None)
+    return not shard_ids or not str(guild_id).isdigit() or shard_id_for(guild_id) in shard_ids
+
+class SharedStore:
+    """JSON documents split into per-guild rows of one SQLite file, so each process only writes guilds it owns.
+
+    Reads run on the caller's thread, writes are queued to a writer thread so a lock held by
+    another process never stalls the event loop.
+    """
+
+    def __init__(self, path):
+        self.db = self.connect(path)
+        self.writer_db = self.connect(path)
+        self.with_retry(lambda: self.writer_db.execute('PRAGMA journal_mode=WAL'))
+        self.with_retry(lambda: self.writer_db.execute(
+            'CREATE TABLE IF NOT EXISTS documents '
+            '(doc TEXT, guild TEXT, data TEXT, version INTEGER, seq INTEGER, PRIMARY KEY (doc, guild))'
+        ))
+        if 'seq' not in [column[1] for column in self.writer_db.execute('PRAGMA table_info(documents)')]:
+            self.with_retry(lambda: self.writer_db.execute('ALTER TABLE documents ADD COLUMN seq INTEGER'))
+        self.with_retry(lambda: self.writer_db.execute('CREATE INDEX IF NOT EXISTS documents_seq ON documents (seq)'))
+        # Every write stamps its rows with the next store-wide seq, so polling only reads rows newer than the last seen
+        self.last_seq = self.db.execute('SELECT COALESCE(MAX(seq), 0) FROM documents').fetchone()[0]
+        self.versions = {}  # {(doc, guild): version} last read or written by this process
+        self.rows = {}  # {(doc, guild): serialized row} so unchanged rows aren't rewritten
+        self.pending = {}  # {(doc, guild): queued writes} rows the writer thread hasn't committed yet
+        self.lock = threading.Lock()  # guards versions and pending, which the writer thread updates
+        self.writes = queue.Queue()  # (doc, {guild: row}) batches, None stops the writer
+        self.writer = threading.Thread(target=self.write_loop, name='store-writer', daemon=True)
+        self.writer.start()
+
+    @staticmethod
+    def connect(path):
+        db = sqlite3.connect(path, timeout=CLUSTER_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    @staticmethod
+    def with_retry(operation):
+        """Run a database operation, backing off while another process holds the lock"""
+        delay = CLUSTER_RETRY_DELAY
+        while True:
+            try:
+                return operation()
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) and 'busy' not in str(e):
+                    raise
+                time.sleep(delay)
+                delay = min(delay * 2, CLUSTER_MAX_RETRY_DELAY)
+
+    @staticmethod
+    def split(data):
+        """Group a document's entries by the guild ID they belong to"""
+        rows = {}
+        if isinstance(data, list):
+            for item in data:
+                rows.setdefault(str(item.get('guild_id')), []).append(item)
+        else:
+            for key, value in data.items():
+                # Keys are either a guild ID or "guildid_userid"
+                rows.setdefault(str(key).split('_')[0], {})[key] = value
+        return rows
+
+    def load(self, doc, default):
+        data = default
+        for guild, row, version in self.db.execute('SELECT guild, data, version FROM documents WHERE doc = ?', (doc,)):
+            part = json.loads(row)
+            if isinstance(data, list):
+                data.extend(part)
+            else:
+                data.update(part)
+            with self.lock:
+                self.versions[(doc, guild)] = version
+            self.rows[(doc, guild)] = row
+        return data
+
+    def load_row(self, doc, guild):
+        found = self.db.execute('SELECT data, version FROM documents WHERE doc = ? AND guild = ?', (doc, guild)).fetchone()
+        if not found:
+            return None
+        with self.lock:
+            self.versions[(doc, guild)] = found[1]
+        self.rows[(doc, guild)] = found[0]
+        return json.loads(found[0])
+
+    def save(self, doc, data):
+        """Queue the rows of guilds this process owns that changed since they were last read or written"""
+        rows = self.split(data)
+        for row_doc, guild in list(self.rows):
+            if row_doc == doc and guild not in rows:
+                rows[guild] = [] if isinstance(data, list) else {}
+
+        changed = {}
+        for guild, part in rows.items():
+            row = json.dumps(part, separators=(',', ':'))
+            if owns_guild(guild) and self.rows.get((doc, guild)) != row:
+                changed[guild] = row
+        if not changed:
+            return
+
+        with self.lock:
+            for guild, row in changed.items():
+                self.rows[(doc, guild)] = row
+                self.pending[(doc, guild)] = self.pending.get((doc, guild), 0) + 1
+        self.writes.put((doc, changed))
+
+    def write_rows(self, doc, changed):
+        """Write one batch in a single transaction, returns the new version of each row"""
+        versions = {}
+        self.writer_db.execute('BEGIN IMMEDIATE')
+        try:
+            seq = self.writer_db.execute('SELECT COALESCE(MAX(seq), 0) FROM documents').fetchone()[0]
+            for guild, row in changed.items():
+                seq += 1
+                self.writer_db.execute(
+                    'INSERT INTO documents (doc, guild, data, version, seq) VALUES (?, ?, ?, 1, ?) '
+                    'ON CONFLICT (doc, guild) DO UPDATE SET data = excluded.data, version = version + 1, seq = excluded.seq',
+                    (doc, guild, row, seq)
+                )
+                versions[guild] = self.writer_db.execute(
+                    'SELECT version FROM documents WHERE doc = ? AND guild = ?', (doc, guild)
+                ).fetchone()[0]
+            self.writer_db.execute('COMMIT')
+        except Exception:
+            self.writer_db.execute('ROLLBACK')
+            raise
+        return versions
+
+    def write_loop(self):
+        """Writer thread: commit queued batches in order"""
+        while True:
+            batch = self.writes.get()
+            if batch is None:
+                return
+            doc, changed = batch
+            try:
+                versions = self.with_retry(lambda: self.write_rows(doc, changed))
+            except Exception as e:
+                print(f"Error writing {doc} to the shared store: {e}")
+                versions = {}
+            with self.lock:
+                for guild in changed:
+                    key = (doc, guild)
+                    if guild in versions:
+                        self.versions[key] = versions[guild]
+                    else:
+                        # Forget the cached row so the next save writes it again
+                        self.rows.pop(key, None)
+                    self.pending[key] -= 1
+                    if not self.pending[key]:
+                        del self.pending[key]
+
+    def close(self):
+        """Wait for queued writes to reach the database"""
+        self.writes.put(None)
+        self.writer.join()
+
+    def changed_rows(self):
+        """Get the (doc, guild) rows another process wrote since this one last saw them"""
+        stored = self.db.execute('SELECT doc, guild, version, seq FROM documents WHERE seq > ? ORDER BY seq', (self.last_seq,)).fetchall()
+        if not stored:
+            return []
+        self.last_seq = stored[-1][3]
+        with self.lock:
+            # Rows still queued here would be overwritten by this process's own write anyway
+            return [
+                (doc, guild) for doc, guild, version, _ in stored
+                if (doc, guild) not in self.pending and self.versions.get((doc, guild)) != version
+            ]
+
+shared_store = SharedStore(CLUSTER_STORE) if CLUSTER_STORE else None
+if shared_store:
+    atexit.register(shared_store.close)
+
+def apply_shared_change(doc, guild):
+    """Refresh this process's cached copy of a row another process changed"""
+    part = shared_store.load_row(doc, guild)
+    if not isinstance(part, dict):
+        part = {}
+
+    if doc == 'guild_config.json':
+        raw = part.get(guild, {})
+        if guild_config_data is not None:
+            guild_config_data[guild] = raw
+        config = guild_configs.get(guild)
+        if config:
+            changed_keys = {key for key in set(config.raw) | set(raw) if config.raw.get(key) != raw.get(key)}
+            config.raw = raw
+            config.parse()
+            for listener in guild_config_listeners:
+                listener(guild, changed_keys)
+    elif doc == 'bot_messages.json' and bot_messages is not None:
+        bot_messages[guild] = part.get(guild, {})
+    elif doc.startswith('user_data.'):
+        section = get_user_data_sections().get(doc.split('.', 1)[1])
+        if section is not None:
+            if guild in part:
+                section[guild] = part[guild]
+            else:
+                section.pop(guild, None)
+            sp_rankings.pop(guild, None)
+            permission_cache.pop(guild, None)
+    # Every other document is read from the store on each load_json call
+
+@tasks.loop(seconds=CLUSTER_POLL_INTERVAL)
+async def sync_shared_store():
+    """Pick up rows other cluster processes wrote"""
+    for doc, guild in shared_store.changed_rows():
+        try:
+            apply_shared_change(doc, guild)
+        except Exception as e:
+            print(f"Error applying shared store change {doc}/{guild}: {e}")
+
+# Guild configuration
+guild_config_data = None  # raw guild_config.json contents, loaded once on first use
+guild_configs = {}  # {guild_id: GuildConfig}
+guild_config_listeners = []  # [callback(guild_id, changed_keys)] run after a guild's config changes
+
+def parse_id_set(value):
+    """Parse a comma-joined ID string into a frozenset of ints"""
+    if not value:
+        return frozenset()
+    if isinstance(value, str):
+        value = value.split(',')
+    return frozenset(int(item) for item in value if str(item).strip())
+
+class GuildConfig:
+    """Parsed settings for one guild, backed by its entry in guild_config.json"""
+
+    def __init__(self, guild_id, raw):
+        self.guild_id = str(guild_id)
+        self.raw = raw
+        self.parse()
+
+    def parse(self):
+        raw = self.raw
+        self.welcomer_enabled = bool(raw.get('welcomer_enabled', False))
+        self.welcomer_channel = raw.get('welcomer_channel')
+        self.automod_enabled = bool(raw.get('automod_enabled', False))
+        self.automod_log_channel = raw.get('automod_log_channel')
+        self.spam_channels = parse_id_set(raw.get('spam_channels', ''))
+        self.link_channels = parse_id_set(raw.get('link_channels', ''))
+        self.leveling_channel = raw.get('leveling_channel')
+        self.staff_roles = parse_id_set(raw.get('staff_roles', ''))
+        self.verified_role = raw.get('verified_role')
+        self.seeding_mode = raw.get('seeding_mode', 'random')
+        self.raid_enabled = bool(raw.get('raid_enabled', False))
+        self.raid_join_threshold = int(raw.get('raid_join_threshold', 10))
+        self.raid_window = int(raw.get('raid_window', 60))
+        self.raid_actions = frozenset(action for action in raw.get('raid_actions', 'pause_welcome,lock,alert').split(',') if action)
+        self.raid_lock_channels = parse_id_set(raw.get('raid_lock_channels', ''))
+        self.raid_locked = {int(channel_id): previous for channel_id, previous in raw.get('raid_locked', {}).items()}
+        self.welcome_batch_size = int(raw.get('welcome_batch_size', 20))
+        self.welcome_batch_interval = float(raw.get('welcome_batch_interval', 5))
+        self.duplicate_channels = int(raw.get('duplicate_channels', 3))
+        self.duplicate_window = int(raw.get('duplicate_window', 30))
+        self.flood_limits = {
+            kind: (int(raw.get(f'{kind}_limit', limit)), float(raw.get(f'{kind}_window', window)))
+            for kind, (limit, window) in FLOOD_DEFAULTS.items()
+        }
+
+    def update(self, **changes):
+        """Change settings, write them through to guild_config.json and notify listeners"""
+        self.raw.update(changes)
+        guild_config_data[self.guild_id] = self.raw
+        self.parse()
+        save_json('guild_config.json', guild_config_data)
+
+        for listener in guild_config_listeners:
+            listener(self.guild_id, set(changes))
+
+def get_guild_config(guild_id):
+    """Get the cached config object for a guild"""
+    global guild_config_data
+    if guild_config_data is None:
+        guild_config_data = load_json('guild_config.json')
+
+    guild_str = str(guild_id)
+    config = guild_configs.get(guild_str)
+    if config is None:
+        config = GuildConfig(guild_str, guild_config_data.get(guild_str, {}))
+        guild_configs[guild_str] = config
+    return config
+
+def on_guild_config_change(listener):
+    """Register a callback to run whenever a guild's config is updated"""
+    guild_config_listeners.append(listener)
+    return listener
+
 # Load and save data functions for SP system
-def load_data():
-    global sp_data, role_permissions, log_channels, bracket_roles
-    try:
-        with open('user_data.json', 'r') as f:
-            data = json.load(f)
-            sp_data = data.get('sp_data', {})
-            role_permissions = data.get('role_permissions', {})
-            log_channels = data.get('log_channels', {})
-            bracket_roles = data.get('bracket_roles', {})
-            # Teams data is not loaded since it contains Discord objects
-            teams.clear()
-            team_invitations.clear()
-            player_teams.clear()
-    except FileNotFoundError:
-        pass
+USER_DATA_SECTIONS = ['sp_data', 'role_permissions', 'log_channels', 'bracket_roles', 'ratings', 'player_stats', 'teams', 'player_teams', 'team_counters']
 
-def save_data():
-    data = {
+@timed('storage.load_data')
+def load_data():
+    global sp_data, role_permissions, log_channels, bracket_roles, ratings, player_stats
+    global teams, player_teams, team_counters
+    if shared_store:
+        data = {name: shared_store.load(f'user_data.{name}', {}) for name in USER_DATA_SECTIONS}
+    else:
+        try:
+            with open('user_data.json', 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+    sp_data = data.get('sp_data', {})
+    role_permissions = data.get('role_permissions', {})
+    log_channels = data.get('log_channels', {})
+    bracket_roles = data.get('bracket_roles', {})
+    ratings = data.get('ratings', {})
+    player_stats = data.get('player_stats', {})
+    teams = data.get('teams', {})
+    player_teams = data.get('player_teams', {})
+    team_counters = data.get('team_counters', {})
+    sp_rankings.clear()
+    permission_cache.clear()
+    # Invitations are short-lived and not persisted
+    team_invitations.clear()
+    invitation_expiry_heap.clear()
+
+def get_user_data_sections():
+    """Get the persisted user data dicts by section name"""
+    return {
         'sp_data': sp_data,
         'role_permissions': role_permissions,
         'log_channels': log_channels,
-        'bracket_roles': bracket_roles
+        'bracket_roles': bracket_roles,
+        'ratings': ratings,
+        'player_stats': player_stats,
+        'teams': teams,
+        'player_teams': player_teams,
+        'team_counters': team_counters
     }
+
+@timed('storage.save_data')
+def save_data():
+    data = get_user_data_sections()
+    if shared_store:
+        for name, section in data.items():
+            shared_store.save(f'user_data.{name}', section)
+        return
     with open('user_data.json', 'w') as f:
-        json.dump(data, f)
+        json.dump(data, f, separators=(',', ':'))
 
 def add_sp(guild_id, user_id, sp):
     """Add seasonal points to a user"""
@@ -137,9 +620,10 @@ def add_sp(guild_id, user_id, sp):
         sp_data[guild_str][user_str] = 0
 
     sp_data[guild_str][user_str] += sp
+    sp_rankings.pop(guild_str, None)
     save_data()
     # Update logs message when SP changes
-    asyncio.create_task(update_logs_message(guild_id))
+    schedule_logs_update(guild_id)
 
 def get_sp(guild_id, user_id):
     """Get seasonal points for a user"""
@@ -147,6 +631,165 @@ def get_sp(guild_id, user_id):
     user_str = str(user_id)
     return sp_data.get(guild_str, {}).get(user_str, 0)
 
+def get_sp_rankings(guild_id):
+    """Get cached SP leaderboard positions ({user_id: rank}) for a guild"""
+    guild_str = str(guild_id)
+    if guild_str not in sp_rankings:
+        ordered = sorted(sp_data.get(guild_str, {}).items(), key=lambda item: item[1], reverse=True)
+        sp_rankings[guild_str] = {user_str: rank for rank, (user_str, _) in enumerate(ordered, 1)}
+    return sp_rankings[guild_str]
+
+# Rating functions (Elo)
+DEFAULT_RATING = 1500
+RATING_K = 32
+
+def get_rating(guild_id, user_id):
+    """Get a user's rating"""
+    entry = ratings.get(str(guild_id), {}).get(str(user_id))
+    return entry[0] if entry else DEFAULT_RATING
+
+def get_rating_games(guild_id, user_id):
+    """Get the number of rated matches a user has played"""
+    entry = ratings.get(str(guild_id), {}).get(str(user_id))
+    return entry[1] if entry else 0
+
+def record_match_rating(guild_id, winners, losers):
+    """Update ratings for one reported match, winners and losers are lists of players"""
+    winners = [player for player in winners if not isinstance(player, FakePlayer)]
+    losers = [player for player in losers if not isinstance(player, FakePlayer)]
+
+    # Matches against bots are byes and don't count
+    if not winners or not losers:
+        return
+
+    guild_str = str(guild_id)
+    if guild_str not in ratings:
+        ratings[guild_str] = {}
+    guild_ratings = ratings[guild_str]
+
+    # Teams play at the average rating of their members
+    winner_rating = sum(get_rating(guild_id, player.id) for player in winners) / len(winners)
+    loser_rating = sum(get_rating(guild_id, player.id) for player in losers) / len(losers)
+    expected = 1 / (1 + 10 ** ((loser_rating - winner_rating) / 400))
+    delta = RATING_K * (1 - expected)
+
+    for players, change in ((winners, delta), (losers, -delta)):
+        for player in players:
+            entry = guild_ratings.setdefault(str(player.id), [DEFAULT_RATING, 0])
+            entry[0] = round(entry[0] + change, 1)
+            entry[1] += 1
+
+# Tournament history functions
+HISTORY_FILE = 'tournament_history.jsonl'
+STAT_WINS, STAT_LOSSES, STAT_PODIUMS, STAT_TITLES = range(4)
+
+def get_entrant_ids(entrant):
+    """Get the user IDs of a player or team entrant"""
+    if isinstance(entrant, list):
+        return [player.id for player in entrant]
+    return [entrant.id]
+
+def get_player_stats(guild_id, user_id):
+    """Get [wins, losses, podiums, titles] for a user"""
+    return player_stats.get(str(guild_id), {}).get(str(user_id), [0, 0, 0, 0])
+
+def bump_player_stat(guild_id, user_id, stat):
+    """Increment one aggregate counter for a user"""
+    guild_str = str(guild_id)
+    if guild_str not in player_stats:
+        player_stats[guild_str] = {}
+    player_stats[guild_str].setdefault(str(user_id), [0, 0, 0, 0])[stat] += 1
+
+def record_match_stats(guild_id, winners, losers):
+    """Update win/loss aggregates for one reported match"""
+    for player in winners:
+        if not isinstance(player, FakePlayer):
+            bump_player_stat(guild_id, player.id, STAT_WINS)
+    for player in losers:
+        if not isinstance(player, FakePlayer):
+            bump_player_stat(guild_id, player.id, STAT_LOSSES)
+
+def archive_tournament(guild_id, tournament, placements):
+    """Append a finished tournament to the history archive and update podium aggregates"""
+    record = {
+        'guild_id': guild_id,
+        'title': tournament.title,
+        'mode': tournament.mode,
+        'map': tournament.map,
+        'finished_at': datetime.now().isoformat(),
+        'rounds': [[[get_entrant_ids(a), get_entrant_ids(b)] for a, b in round_pairs] for round_pairs in tournament.rounds],
+        'matches': tournament.match_log,
+        'placements': [[place, get_entrant_ids(entrant)] for place, entrant, _ in placements]
+    }
+
+    for place, entrant, _ in placements:
+        members = entrant if isinstance(entrant, list) else [entrant]
+        for player in members:
+            if isinstance(player, FakePlayer):
+                continue
+            if place <= 3:
+                bump_player_stat(guild_id, player.id, STAT_PODIUMS)
+            if place == 1:
+                bump_player_stat(guild_id, player.id, STAT_TITLES)
+
+    try:
+        with open(HISTORY_FILE, 'a') as f:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+    except OSError as e:
+        print(f"Error archiving tournament: {e}")
+
+# Bracket seeding functions
+SEEDING_MODES = ['random', 'sp', 'rating']
+
+def create_fake_player(tournament):
+    """Create the next bot filler player for a tournament"""
+    bot_name = f"Bot{tournament.fake_count}"
+    bot_id = 761557952975420886 + tournament.fake_count
+    tournament.fake_count += 1
+    return FakePlayer(bot_name, bot_id)
+
+def bracket_seed_order(size):
+    """Seed numbers in bracket slot order, e.g. 8 -> [1, 8, 4, 5, 2, 7, 3, 6]"""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for top in order for seed in (top, total - top)]
+    return order
+
+def get_seed_score(guild_id, entrant, seeding):
+    """Get sort key for an entrant (player or team list), lower is a better seed"""
+    members = entrant if isinstance(entrant, list) else [entrant]
+
+    if seeding == 'sp':
+        rankings = get_sp_rankings(guild_id)
+        unranked = len(rankings) + 1
+        return sum(rankings.get(str(player.id), unranked) for player in members) / len(members)
+
+    if seeding == 'rating':
+        return -sum(get_rating(guild_id, player.id) for player in members) / len(members)
+
+    return 0
+
+def seed_bracket(guild_id, entrants, seeding, make_bye):
+    """Place entrants into standard bracket slots (1 vs N, 2 vs N-1, ...), filling byes with make_bye()"""
+    ranked = sorted(entrants, key=lambda entrant: get_seed_score(guild_id, entrant, seeding))
+
+    size = 2
+    while size < len(ranked):
+        size *= 2
+
+    # Byes take the lowest seeds so the top seeds face them in round 1
+    while len(ranked) < size:
+        ranked.append(make_bye())
+
+    return [ranked[seed - 1] for seed in bracket_seed_order(size)]
+
+def get_entrant_key(entrant):
+    """Get a hashable key for a player or team entrant"""
+    if isinstance(entrant, list):
+        return tuple(player.id for player in entrant)
+    return entrant.id
+
 # Helper functions
 def parse_time(time_str):
     """Parse time string like '1h', '30m', '2d' into timedelta"""
@@ -171,48 +814,62 @@ def parse_time(time_str):
     
     return None
 
+PERMISSION_TYPES = ['htr', 'adr', 'tlr']
+
+def get_permission_roles(guild_id):
+    """Get cached frozensets of role IDs allowed for staff and each permission type"""
+    guild_str = str(guild_id)
+    cached = permission_cache.get(guild_str)
+    if cached is None:
+        guild_permissions = role_permissions.get(guild_str, {})
+
+        # ADR has all permissions, so it is folded into every permission type
+        adr_roles = frozenset(int(role_id) for role_id in guild_permissions.get('adr', []))
+        cached = {'staff': get_guild_config(guild_id).staff_roles}
+        for permission_type in PERMISSION_TYPES:
+            cached[permission_type] = adr_roles | frozenset(int(role_id) for role_id in guild_permissions.get(permission_type, []))
+        permission_cache[guild_str] = cached
+    return cached
+
+def invalidate_permission_cache(guild_id):
+    """Drop cached permission roles after staff roles or role permissions change"""
+    permission_cache.pop(str(guild_id), None)
+
+@on_guild_config_change
+def refresh_permission_cache(guild_id, changed_keys):
+    if 'staff_roles' in changed_keys:
+        invalidate_permission_cache(guild_id)
+
+def get_member_role_ids(member):
+    """Get the IDs of a member's roles, including @everyone"""
+    return {role.id for role in member.roles}
+
 async def is_staff(ctx):
     """Check if user is staff"""
     if ctx.author.guild_permissions.manage_messages:
         return True
-    
-    guild_config = load_json('guild_config.json')
-    config = guild_config.get(str(ctx.guild.id), {})
-    staff_roles = config.get('staff_roles', '')
-    
-    if staff_roles:
-        staff_role_ids = staff_roles.split(',')
-        user_role_ids = [str(role.id) for role in ctx.author.roles]
-        return any(role_id in staff_role_ids for role_id in user_role_ids)
-    
-    return False
+
+    staff_role_ids = get_permission_roles(ctx.guild.id)['staff']
+    return not staff_role_ids.isdisjoint(get_member_role_ids(ctx.author))
 
 def has_permission(user, guild_id, permission_type):
     """Check if user has specific permission type"""
-    guild_str = str(guild_id)
-    if guild_str not in role_permissions:
-        return False
-
-    # ADR has all permissions
-    if 'adr' in role_permissions[guild_str]:
-        user_role_ids = [role.id for role in user.roles]
-        adr_role_ids = role_permissions[guild_str]['adr']
-        if any(role_id in adr_role_ids for role_id in user_role_ids):
-            return True
-
-    if permission_type not in role_permissions[guild_str]:
-        return False
+    roles = get_permission_roles(guild_id)
+    allowed_role_ids = roles.get(permission_type, roles['adr'])
+    return not allowed_role_ids.isdisjoint(get_member_role_ids(user))
 
-    user_role_ids = [role.id for role in user.roles]
-    allowed_role_ids = role_permissions[guild_str][permission_type]
-
-    return any(role_id in allowed_role_ids for role_id in user_role_ids)
-
-def get_player_display_name(player, guild_id=None):
-    """Get player display name"""
+def get_player_display_name(player, guild=None):
+    """Get player display name, resolving participant records through the guild's member cache"""
     if isinstance(player, FakePlayer):
         return player.display_name
 
+    if isinstance(player, list):
+        return get_team_display_name(guild, player)
+
+    if isinstance(player, Participant):
+        member = guild.get_member(player.id) if guild else None
+        return member.display_name if member else player.mention
+
     if hasattr(player, 'display_name'):
         return player.display_name
     elif hasattr(player, 'name'):
@@ -226,36 +883,47 @@ def get_team_id(guild_id, user_id):
     user_str = str(user_id)
     return player_teams.get(guild_str, {}).get(user_str)
 
-def get_team_members(guild_id, team_id):
-    """Get all members of a team"""
+def get_team_member_ids(guild_id, team_id):
+    """Get the user IDs of a team"""
     guild_str = str(guild_id)
     return teams.get(guild_str, {}).get(team_id, [])
 
-def get_teammate(guild_id, user_id):
+async def get_team_members(guild, team_id):
+    """Get all members of a team that are still in the guild"""
+    members = []
+    for user_id in get_team_member_ids(guild.id, team_id):
+        member = await resolve_member(guild, user_id)
+        if member:
+            members.append(member)
+    return members
+
+async def get_teammate(guild, user_id):
     """Get the teammate of a user"""
-    team_id = get_team_id(guild_id, user_id)
+    team_id = get_team_id(guild.id, user_id)
     if not team_id:
         return None
-    team_members = get_team_members(guild_id, team_id)
-    for member in team_members:
-        if member.id != user_id:
-            return member
+    for member_id in get_team_member_ids(guild.id, team_id):
+        if member_id != user_id:
+            return await resolve_member(guild, member_id)
     return None
 
-def create_team(guild_id, player1, player2):
+def create_team(guild_id, player1_id, player2_id):
     """Create a new team with two players"""
     guild_str = str(guild_id)
 
     if guild_str not in teams:
         teams[guild_str] = {}
+    if guild_str not in player_teams:
         player_teams[guild_str] = {}
 
-    # Generate unique team ID
-    team_id = f"team_{len(teams[guild_str]) + 1}_{guild_id}"
+    # Team numbers only ever increase, so removed teams never collide with new ones
+    team_counters[guild_str] = team_counters.get(guild_str, 0) + 1
+    team_id = f"team_{team_counters[guild_str]}_{guild_id}"
 
-    teams[guild_str][team_id] = [player1, player2]
-    player_teams[guild_str][str(player1.id)] = team_id
-    player_teams[guild_str][str(player2.id)] = team_id
+    teams[guild_str][team_id] = [player1_id, player2_id]
+    player_teams[guild_str][str(player1_id)] = team_id
+    player_teams[guild_str][str(player2_id)] = team_id
+    save_data()
 
     return team_id
 
@@ -265,21 +933,104 @@ def remove_team(guild_id, team_id):
 
     if guild_str in teams and team_id in teams[guild_str]:
         # Remove players from player_teams
-        for player in teams[guild_str][team_id]:
-            if str(player.id) in player_teams[guild_str]:
-                del player_teams[guild_str][str(player.id)]
+        for user_id in teams[guild_str][team_id]:
+            player_teams[guild_str].pop(str(user_id), None)
 
         # Remove team
         del teams[guild_str][team_id]
-
-def get_team_display_name(guild_id, team_members):
+        save_data()
+
+# Team invitation functions
+TEAM_INVITE_TTL = 600  # seconds
+
+def reap_team_invitations():
+    """Drop expired invitations, only touching the entries that are due"""
+    now = time.time()
+    while invitation_expiry_heap and invitation_expiry_heap[0][0] <= now:
+        expires_at, guild_str, user_str, inviter_str = heapq.heappop(invitation_expiry_heap)
+        pending = team_invitations.get(guild_str, {}).get(user_str)
+        # Skip heap entries that were superseded by a newer invite or already answered
+        if pending and pending.get(inviter_str) == expires_at:
+            del pending[inviter_str]
+            if not pending:
+                del team_invitations[guild_str][user_str]
+
+def add_team_invitation(guild_id, user_id, inviter_id):
+    """Store an invitation that expires after TEAM_INVITE_TTL seconds"""
+    guild_str, user_str, inviter_str = str(guild_id), str(user_id), str(inviter_id)
+    expires_at = time.time() + TEAM_INVITE_TTL
+    team_invitations.setdefault(guild_str, {}).setdefault(user_str, {})[inviter_str] = expires_at
+    heapq.heappush(invitation_expiry_heap, (expires_at, guild_str, user_str, inviter_str))
+
+def has_team_invitation(guild_id, user_id, inviter_id):
+    """Check if a user has a pending invitation from inviter"""
+    reap_team_invitations()
+    return str(inviter_id) in team_invitations.get(str(guild_id), {}).get(str(user_id), {})
+
+def clear_team_invitations(guild_id, user_id):
+    """Remove all pending invitations for a user"""
+    team_invitations.get(str(guild_id), {}).pop(str(user_id), None)
+
+def get_team_display_name(guild, team_members):
     """Get display name for a team"""
     if len(team_members) == 2:
-        name1 = get_player_display_name(team_members[0], guild_id)
-        name2 = get_player_display_name(team_members[1], guild_id)
+        name1 = get_player_display_name(team_members[0], guild)
+        name2 = get_player_display_name(team_members[1], guild)
         return f"{name1} & {name2}"
     return "Unknown Team"
 
+# Log queue
+LOG_BATCH_SIZE = 10  # embeds per message, Discord's limit
+LOG_FLUSH_INTERVAL = 2  # seconds to wait for more entries before sending a partial batch
+LOG_MAX_PENDING = 100  # entries queued per channel before new ones are only counted
+
+log_queues = {}  # {channel_id: {'embeds': deque, 'dropped': {title: count}, 'task': asyncio.Task}}
+
+def queue_log(channel, embed):
+    """Queue an embed for a log channel without waiting on Discord"""
+    queue = log_queues.get(channel.id)
+    if queue is None:
+        queue = log_queues[channel.id] = {'embeds': deque(), 'dropped': {}, 'task': None}
+
+    if len(queue['embeds']) >= LOG_MAX_PENDING:
+        queue['dropped'][embed.title] = queue['dropped'].get(embed.title, 0) + 1
+        bump_counter("log_queue.dropped")
+    else:
+        queue['embeds'].append(embed)
+
+    if queue['task'] is None:
+        queue['task'] = asyncio.create_task(flush_log_queue(channel))
+
+def log_backpressure_embed(dropped):
+    embed = discord.Embed(
+        title="⚠️ Log Entries Dropped",
+        description=f"The log channel fell behind, so {sum(dropped.values())} entries were summarized instead of posted.",
+        color=0xffa500,
+        timestamp=datetime.now()
+    )
+    embed.add_field(name="Entries", value="\n".join(f"{title} x{count}" for title, count in dropped.items())[:1024], inline=False)
+    return embed
+
+async def flush_log_queue(channel):
+    """Send queued log embeds in batches of up to LOG_BATCH_SIZE per message"""
+    queue = log_queues[channel.id]
+    try:
+        while queue['embeds'] or queue['dropped']:
+            if len(queue['embeds']) < LOG_BATCH_SIZE:
+                await asyncio.sleep(LOG_FLUSH_INTERVAL)
+
+            batch = [queue['embeds'].popleft() for _ in range(min(LOG_BATCH_SIZE, len(queue['embeds'])))]
+            if queue['dropped'] and len(batch) < LOG_BATCH_SIZE:
+                batch.append(log_backpressure_embed(queue['dropped']))
+                queue['dropped'] = {}
+
+            try:
+                await channel.send(embeds=batch)
+            except discord.HTTPException as e:
+                print(f"Error sending log batch: {e}")
+    finally:
+        queue['task'] = None
+
 async def log_command(guild_id, user, command, details=""):
     """Log tournament commands to designated channel"""
     guild_str = str(guild_id)
@@ -302,7 +1053,7 @@ async def log_command(guild_id, user, command, details=""):
         if details:
             embed.add_field(name="Details", value=details, inline=False)
 
-        await channel.send(embed=embed)
+        queue_log(channel, embed)
     except Exception as e:
         print(f"Error logging command: {e}")
 
@@ -381,6 +1132,113 @@ async def check_bad_words(content):
     
     return bad_word_count >= 3
 
+DUPLICATE_MIN_LENGTH = 8  # short replies like "gg" are repeated across channels legitimately
+DUPLICATE_MAX_USERS = 10000
+
+class FingerprintWindow:
+    """Recent content fingerprints for one member, with the channels each was posted in"""
+    __slots__ = ('events', 'channels')
+
+    def __init__(self):
+        self.events = deque()  # (timestamp, fingerprint, channel_id) in posting order
+        self.channels = {}  # {fingerprint: {channel_id: last_seen}}
+
+    def expire(self, cutoff):
+        while self.events and self.events[0][0] < cutoff:
+            timestamp, fingerprint, channel_id = self.events.popleft()
+            seen = self.channels.get(fingerprint)
+            if seen and seen.get(channel_id) == timestamp:
+                del seen[channel_id]
+                if not seen:
+                    del self.channels[fingerprint]
+
+    def add(self, timestamp, fingerprint, channel_id):
+        """Record a post and return how many channels this content was seen in"""
+        self.events.append((timestamp, fingerprint, channel_id))
+        seen = self.channels.setdefault(fingerprint, {})
+        seen[channel_id] = timestamp
+        return len(seen)
+
+content_fingerprints = OrderedDict()  # {(guild_id, user_id): FingerprintWindow}, least recently active first
+
+def content_fingerprint(content):
+    """Normalize message text and hash it to a 64-bit integer, None if too short to compare"""
+    normalized = ' '.join(re.sub(r'[^\w\s]', '', content.lower()).split())
+    if len(normalized) < DUPLICATE_MIN_LENGTH:
+        return None
+    return int.from_bytes(hashlib.blake2b(normalized.encode(), digest_size=8).digest(), 'big')
+
+async def check_cross_channel_duplicates(message, config):
+    """Check if a member posted the same content in several channels within the window"""
+    fingerprint = content_fingerprint(message.content)
+    if fingerprint is None:
+        return False
+
+    key = (message.guild.id, message.author.id)
+    window = content_fingerprints.get(key)
+    if window is None:
+        window = content_fingerprints[key] = FingerprintWindow()
+        if len(content_fingerprints) > DUPLICATE_MAX_USERS:
+            content_fingerprints.popitem(last=False)
+    else:
+        content_fingerprints.move_to_end(key)
+
+    now = time.time()
+    window.expire(now - config.duplicate_window)
+    return window.add(now, fingerprint, message.channel.id) >= config.duplicate_channels
+
+FLOOD_DEFAULTS = {'mention': (10, 30), 'attachment': (8, 30), 'message': (8, 5)}  # {kind: (limit, window seconds)}
+FLOOD_MAX_USERS = 10000
+
+class TokenBucket:
+    """Allows `capacity` units at once, refilling `capacity / window` units per second"""
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity, window, now):
+        self.capacity = capacity
+        self.rate = capacity / window
+        self.tokens = capacity
+        self.updated = now
+
+    def consume(self, amount, now):
+        """Take `amount` units, returns False when the bucket runs dry"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        if self.tokens < 0:
+            self.tokens = 0
+            return False
+        return True
+
+flood_buckets = OrderedDict()  # {(guild_id, user_id): {kind: TokenBucket}}, least recently active first
+
+@on_guild_config_change
+def reset_flood_buckets(guild_id, changed_keys):
+    if any(key.endswith(('_limit', '_window')) and key.split('_')[0] in FLOOD_DEFAULTS for key in changed_keys):
+        for key in [key for key in flood_buckets if key[0] == int(guild_id)]:
+            del flood_buckets[key]
+
+async def check_floods(message, config):
+    """Charge a message against the member's mention, attachment and message buckets, returns the kinds that ran dry"""
+    key = (message.guild.id, message.author.id)
+    now = time.monotonic()
+    buckets = flood_buckets.get(key)
+    if buckets is None:
+        buckets = flood_buckets[key] = {
+            kind: TokenBucket(limit, window, now) for kind, (limit, window) in config.flood_limits.items()
+        }
+        if len(flood_buckets) > FLOOD_MAX_USERS:
+            flood_buckets.popitem(last=False)
+    else:
+        flood_buckets.move_to_end(key)
+
+    costs = {
+        'mention': len(message.mentions) + len(message.role_mentions) + (5 if message.mention_everyone else 0),
+        'attachment': len(message.attachments) + len(message.stickers),
+        'message': 1 if message.channel.id not in config.spam_channels else 0,
+    }
+    return [kind for kind, cost in costs.items() if cost and not buckets[kind].consume(cost, now)]
+
 async def check_links(content):
     """Check if message contains links"""
     url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
@@ -388,36 +1246,95 @@ async def check_links(content):
 
 # NEW COMMANDS IMPLEMENTATION
 
+# Bot message registry
+LOGS_UPDATE_DELAY = 2  # seconds to wait so every SP change of one command lands in a single board update
+
+def get_bot_messages(guild_id, kind):
+    """Get the registered channel and message IDs for a bot-owned board, or None"""
+    global bot_messages
+    if bot_messages is None:
+        bot_messages = load_json('bot_messages.json')
+    return bot_messages.get(str(guild_id), {}).get(kind)
+
+def register_bot_messages(guild_id, kind, channel_id, message_ids):
+    """Remember which messages make up a bot-owned board so they can be edited after restarts"""
+    get_bot_messages(guild_id, kind)
+    bot_messages.setdefault(str(guild_id), {})[kind] = {'channel': channel_id, 'messages': list(message_ids)}
+    save_json('bot_messages.json', bot_messages)
+
+def get_bot_messages_lock(guild_id, kind):
+    """Get the lock held while a board is rendered and synced, so two updates never post the same page"""
+    key = (str(guild_id), kind)
+    if key not in bot_messages_locks:
+        bot_messages_locks[key] = asyncio.Lock()
+    return bot_messages_locks[key]
+
+async def delete_bot_messages(channel, message_ids):
+    for message_id in message_ids:
+        try:
+            await channel.get_partial_message(message_id).delete()
+        except discord.NotFound:
+            pass
+
+async def sync_bot_messages(guild_id, kind, channel, embeds):
+    """Edit a board's pages in place by ID, only posting new pages when it grew or a page was deleted.
+
+    Callers hold get_bot_messages_lock(guild_id, kind).
+    """
+    entry = get_bot_messages(guild_id, kind)
+    old_ids = entry['messages'] if entry and entry['channel'] == channel.id else []
+    new_ids = []
+    reposting = False
+
+    for index, embed in enumerate(embeds):
+        if index < len(old_ids) and not reposting:
+            try:
+                await channel.get_partial_message(old_ids[index]).edit(embed=embed)
+                new_ids.append(old_ids[index])
+                continue
+            except discord.NotFound:
+                # Page was deleted, repost it and everything after it so the board stays in order
+                reposting = True
+                await delete_bot_messages(channel, old_ids[index + 1:])
+        message = await channel.send(embed=embed)
+        new_ids.append(message.id)
+
+    # Pages the board no longer needs
+    await delete_bot_messages(channel, [message_id for message_id in old_ids[len(embeds):] if message_id not in new_ids])
+
+    if new_ids != old_ids or not entry:
+        register_bot_messages(guild_id, kind, channel.id, new_ids)
+
 async def update_logs_message(guild_id):
-    """Update the logs message when data changes"""
-    guild_str = str(guild_id)
+    """Update the logs board when data changes"""
+    entry = get_bot_messages(guild_id, 'logs')
+    if not entry:
+        return
     
-    if guild_str not in logs_channels or guild_str not in logs_messages:
+    channel = bot.get_channel(entry['channel'])
+    if not channel:
         return
     
     try:
-        channel = bot.get_channel(logs_channels[guild_str])
-        if not channel or not hasattr(channel, 'fetch_message'):
-            return
-        
-        message = await channel.fetch_message(logs_messages[guild_str])
-        if not message:
-            return
-        
-        # Generate updated embed
-        embeds = await generate_logs_embeds(guild_id)
-        
-        if embeds:
-            # Update the first message
-            await message.edit(embed=embeds[0])
-            
-            # If there are additional embeds, send them as new messages
-            if len(embeds) > 1:
-                for embed in embeds[1:]:
-                    await channel.send(embed=embed)
-    except:
-        pass
-
+        async with get_bot_messages_lock(guild_id, 'logs'):
+            embeds = await generate_logs_embeds(guild_id)
+            if embeds:
+                await sync_bot_messages(guild_id, 'logs', channel, embeds)
+    except discord.HTTPException as e:
+        print(f"Error updating logs board: {e}")
+
+def schedule_logs_update(guild_id):
+    """Update the logs board shortly, a burst of changes shares one update"""
+    if str(guild_id) not in logs_updates:
+        logs_updates[str(guild_id)] = asyncio.create_task(run_scheduled_logs_update(guild_id))
+
+async def run_scheduled_logs_update(guild_id):
+    # Changes made before the update starts rendering are included in it
+    await asyncio.sleep(LOGS_UPDATE_DELAY)
+    logs_updates.pop(str(guild_id), None)
+    await update_logs_message(guild_id)
+
+@timed('logs.generate_embeds')
 async def generate_logs_embeds(guild_id):
     """Generate embeds for the logs command"""
     guild = bot.get_guild(guild_id)
@@ -436,14 +1353,25 @@ async def generate_logs_embeds(guild_id):
     max_fields_per_embed = 25
     field_count = 0
     
-    for member in guild.members:
-        if member.bot:
+    user_accounts = load_json('user_accounts.json')
+    
+    # Only members that can appear on the board: SP, bracket roles or a linked account
+    board_ids = {int(user_str) for user_str, sp in sp_data.get(guild_str, {}).items() if sp > 0}
+    board_ids.update(int(user_str) for user_str, emojis in bracket_roles.get(guild_str, {}).items() if emojis)
+    account_prefix = f"{guild_id}_"
+    board_ids.update(
+        int(key[len(account_prefix):]) for key, account_data in user_accounts.items()
+        if key.startswith(account_prefix) and isinstance(account_data, dict) and account_data.get('ign')
+    )
+    
+    for user_id in sorted(board_ids):
+        member = await resolve_member(guild, user_id)
+        if not member or member.bot:
             continue
             
         user_str = str(member.id)
         
         # Get linked account
-        user_accounts = load_json('user_accounts.json')
         account_key = f"{guild_id}_{member.id}"
         account_data = user_accounts.get(account_key, {})
         linked_account = account_data.get('ign', 'Not Linked') if isinstance(account_data, dict) else 'Not Linked'
@@ -499,20 +1427,13 @@ async def logs(ctx, channel: discord.TextChannel):
         await ctx.send("You don't have permission to use this command.")
         return
     
-    guild_str = str(ctx.guild.id)
-    logs_channels[guild_str] = channel.id
-    
-    embeds = await generate_logs_embeds(ctx.guild.id)
+    async with get_bot_messages_lock(ctx.guild.id, 'logs'):
+        embeds = await generate_logs_embeds(ctx.guild.id)
+        if embeds:
+            # Post the pages and register their IDs so later updates edit them in place
+            await sync_bot_messages(ctx.guild.id, 'logs', channel, embeds)
     
     if embeds:
-        # Send the first embed and store its message ID for updates
-        message = await channel.send(embed=embeds[0])
-        logs_messages[guild_str] = message.id
-        
-        # Send additional embeds if needed
-        for embed in embeds[1:]:
-            await channel.send(embed=embed)
-        
         await ctx.send(f"✅ Logs have been posted in {channel.mention} and will auto-update when data changes!")
     else:
         await ctx.send("❌ No data to display.")
@@ -593,14 +1514,690 @@ async def game(ctx, game_range: str):
     
     await ctx.send(embed=embed)
 
+# Raid detection
+RAID_ACTIONS = ['pause_welcome', 'lock', 'alert']
+RAID_COOLDOWN = 600  # seconds without a new surge before welcomes resume
+RAID_MAX_WINDOW = 3600
+ACCOUNT_AGE_BUCKETS = [(3600, "< 1 hour"), (86400, "< 1 day"), (7 * 86400, "< 1 week"), (30 * 86400, "< 30 days"), (float('inf'), "older")]
+
+class JoinWindow:
+    """Join counts for the last `window` seconds, kept in one-second ring buckets split by account age"""
+    __slots__ = ('window', 'buckets', 'totals', 'last_second')
+
+    def __init__(self, window):
+        self.window = window
+        self.buckets = [[0] * len(ACCOUNT_AGE_BUCKETS) for _ in range(window)]
+        self.totals = [0] * len(ACCOUNT_AGE_BUCKETS)
+        self.last_second = 0
+
+    def advance(self, second):
+        """Expire buckets older than the window, each bucket is cleared at most once per pass"""
+        if second - self.last_second >= self.window:
+            for bucket in self.buckets:
+                bucket[:] = [0] * len(bucket)
+            self.totals = [0] * len(self.totals)
+        else:
+            for expired in range(self.last_second + 1, second + 1):
+                bucket = self.buckets[expired % self.window]
+                for age_class, count in enumerate(bucket):
+                    self.totals[age_class] -= count
+                    bucket[age_class] = 0
+        self.last_second = max(self.last_second, second)
+
+    def add(self, second, account_age):
+        self.advance(second)
+        age_class = next(i for i, (limit, _) in enumerate(ACCOUNT_AGE_BUCKETS) if account_age < limit)
+        self.buckets[second % self.window][age_class] += 1
+        self.totals[age_class] += 1
+
+    def count(self):
+        return sum(self.totals)
+
+join_windows = {}  # {guild_id: JoinWindow}
+raid_state = {}  # {guild_id: {'until': timestamp}}, locked channels are kept in the guild config's raid_locked
+
+@on_guild_config_change
+def reset_join_window(guild_id, changed_keys):
+    if 'raid_window' in changed_keys or 'raid_enabled' in changed_keys:
+        join_windows.pop(guild_id, None)
+
+def is_raid_active(guild_id):
+    """Check if a guild had a join surge within the last RAID_COOLDOWN seconds (locked channels stay locked until !raid_end)"""
+    state = raid_state.get(str(guild_id))
+    return bool(state) and state['until'] > time.time()
+
+def record_join(member, config):
+    """Count a join, returns True when it crosses the raid threshold"""
+    guild_str = str(member.guild.id)
+    window = join_windows.get(guild_str)
+    if window is None:
+        window = join_windows[guild_str] = JoinWindow(min(max(config.raid_window, 1), RAID_MAX_WINDOW))
+
+    now = time.time()
+    account_age = now - member.created_at.timestamp()
+    window.add(int(now), account_age)
+
+    if window.count() < config.raid_join_threshold:
+        return False
+
+    already_active = is_raid_active(guild_str)
+    state = raid_state.setdefault(guild_str, {'until': now})
+    state['until'] = now + RAID_COOLDOWN
+    return not already_active
+
+async def set_channel_send_permission(channel, send_messages):
+    """Set the @everyone send_messages overwrite of a channel (True, False or None), returns the previous value"""
+    everyone_role = channel.guild.default_role
+    overwrite = channel.overwrites_for(everyone_role)
+    previous = overwrite.send_messages
+    overwrite.send_messages = send_messages
+    await channel.set_permissions(everyone_role, overwrite=None if overwrite.is_empty() else overwrite, reason="Raid protection")
+    return previous
+
+async def trigger_raid_response(guild, config):
+    """Run the configured raid responses once when a surge starts"""
+    bump_counter("raid.triggered")
+    guild_str = str(guild.id)
+    window = join_windows[guild_str]
+
+    if 'lock' in config.raid_actions:
+        locked = dict(config.raid_locked)
+        for channel_id in config.raid_lock_channels - locked.keys():
+            channel = guild.get_channel(channel_id)
+            if not channel:
+                continue
+            try:
+                locked[channel_id] = await set_channel_send_permission(channel, False)
+            except discord.HTTPException as e:
+                print(f"Error locking channel during raid: {e}")
+        if locked != config.raid_locked:
+            # Persisted with each channel's previous overwrite so !raid_end can restore it after a restart
+            config.update(raid_locked={str(channel_id): previous for channel_id, previous in locked.items()})
+
+    if 'alert' in config.raid_actions and config.automod_log_channel:
+        channel = bot.get_channel(config.automod_log_channel)
+        if channel:
+            embed = discord.Embed(
+                title="🚨 Possible Raid Detected",
+                description=f"**{window.count()}** members joined in the last {window.window} seconds.",
+                color=0xff0000,
+                timestamp=datetime.now()
+            )
+            ages = "\n".join(f"{label}: {count}" for (_, label), count in zip(ACCOUNT_AGE_BUCKETS, window.totals))
+            embed.add_field(name="Account Ages", value=ages, inline=True)
+            responses = []
+            if 'pause_welcome' in config.raid_actions:
+                responses.append("Welcome messages paused")
+            if config.raid_locked:
+                responses.append(f"Locked {len(config.raid_locked)} channel(s)")
+            embed.add_field(name="Responses", value="\n".join(responses) or "None", inline=True)
+            embed.set_footer(text="Use !raid_end to unlock channels and end raid mode")
+            staff_mentions = ' '.join(f"<@&{role_id}>" for role_id in config.staff_roles)
+            await channel.send(content=staff_mentions or None, embed=embed)
+
+@bot.command()
+async def raid_setup(ctx, threshold: str, window: int = 60, *actions):
+    """Configure raid detection: !raid_setup <joins> <seconds> [pause_welcome lock alert] or !raid_setup off"""
+    if not await is_staff(ctx):
+        await ctx.send("You don't have permission to use this command.")
+        return
+
+    config = get_guild_config(ctx.guild.id)
+    if threshold.lower() == 'off':
+        config.update(raid_enabled=False)
+        await ctx.send("Raid detection disabled.")
+        return
+
+    actions = [action.lower() for action in actions] or RAID_ACTIONS
+    invalid = [action for action in actions if action not in RAID_ACTIONS]
+    if not threshold.isdigit() or int(threshold) < 2 or not 1 <= window <= RAID_MAX_WINDOW or invalid:
+        await ctx.send(f"Usage: `!raid_setup <joins> <seconds (1-{RAID_MAX_WINDOW})> [{' '.join(RAID_ACTIONS)}]` or `!raid_setup off`")
+        return
+
+    config.update(raid_enabled=True, raid_join_threshold=int(threshold), raid_window=window, raid_actions=','.join(actions))
+    await ctx.send(f"🛡️ Raid detection enabled: {threshold} joins in {window}s triggers {', '.join(actions)}.")
+
+@bot.command()
+async def raid_channels(ctx, *channels: discord.TextChannel):
+    """Set channels to lock when a raid is detected"""
+    if not await is_staff(ctx):
+        await ctx.send("You don't have permission to use this command.")
+        return
+
+    get_guild_config(ctx.guild.id).update(raid_lock_channels=','.join(str(ch.id) for ch in channels))
+    channel_mentions = ', '.join(ch.mention for ch in channels) or 'None'
+    await ctx.send(f"Channels locked during raids: {channel_mentions}")
+
+@bot.command()
+async def raid_end(ctx):
+    """End raid mode, unlock raid-locked channels and resume welcomes"""
+    if not await is_staff(ctx):
+        await ctx.send("You don't have permission to use this command.")
+        return
+
+    config = get_guild_config(ctx.guild.id)
+    state = raid_state.pop(str(ctx.guild.id), None)
+    join_windows.pop(str(ctx.guild.id), None)
+    locked = config.raid_locked
+    if not state and not locked:
+        await ctx.send("Raid mode is not active.")
+        return
+
+    for channel_id, previous in locked.items():
+        channel = ctx.guild.get_channel(channel_id)
+        if channel:
+            try:
+                await set_channel_send_permission(channel, previous)
+            except discord.HTTPException as e:
+                print(f"Error unlocking channel after raid: {e}")
+    if locked:
+        config.update(raid_locked={})
+
+    await ctx.send(f"✅ Raid mode ended. Unlocked {len(locked)} channel(s).")
+
+# Welcomer functions
+WELCOME_MESSAGE = "Welcome! {mentions} Thanks for joining my server you are **GOAT** <:w_trkis:1400194042234667120> <:GOAT:1400194575125188811>"
+WELCOME_MAX_BATCH = 50  # keeps a batched welcome well under the 2000 character limit
+WELCOME_MAX_BACKLOG = 4  # batches kept queued before the rest is summarized
+
+welcome_queues = {}  # {guild_id: [member_id]}
+welcome_last_sent = {}  # {guild_id: timestamp}
+welcome_flush_tasks = {}  # {guild_id: asyncio.Task}
+
+def welcomes_paused(guild_id, config):
+    """Check if welcomes should be skipped right now"""
+    if not config.welcomer_enabled or not config.welcomer_channel:
+        return True
+    return 'pause_welcome' in config.raid_actions and is_raid_active(guild_id)
+
+async def send_welcome(channel, member_ids, extra=0):
+    mentions = ' '.join(f"<@{member_id}>" for member_id in member_ids)
+    if extra:
+        mentions += f" and {extra} more"
+    try:
+        await channel.send(WELCOME_MESSAGE.format(mentions=mentions), allowed_mentions=discord.AllowedMentions(users=True))
+    except discord.HTTPException as e:
+        print(f"Error sending welcome message: {e}")
+
+async def queue_welcome(member, config):
+    """Welcome a member right away when it's quiet, otherwise queue them for the next batch"""
+    guild_str = str(member.guild.id)
+    queue = welcome_queues.setdefault(guild_str, [])
+
+    if not queue and time.time() - welcome_last_sent.get(guild_str, 0) >= config.welcome_batch_interval:
+        channel = bot.get_channel(config.welcomer_channel)
+        if channel:
+            welcome_last_sent[guild_str] = time.time()
+            await send_welcome(channel, [member.id])
+        return
+
+    queue.append(member.id)
+    if guild_str not in welcome_flush_tasks:
+        welcome_flush_tasks[guild_str] = asyncio.create_task(flush_welcomes(guild_str))
+
+async def flush_welcomes(guild_str):
+    """Send queued welcomes as one message per interval until the queue is empty"""
+    try:
+        while welcome_queues.get(guild_str):
+            config = get_guild_config(guild_str)
+            wait = config.welcome_batch_interval - (time.time() - welcome_last_sent.get(guild_str, 0))
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            queue = welcome_queues[guild_str]
+            channel = bot.get_channel(config.welcomer_channel) if config.welcomer_channel else None
+            if welcomes_paused(guild_str, config) or not channel:
+                queue.clear()
+                break
+
+            batch_size = max(1, min(config.welcome_batch_size, WELCOME_MAX_BATCH))
+            batch = queue[:batch_size]
+            del queue[:batch_size]
+            extra = 0
+            if len(queue) > batch_size * WELCOME_MAX_BACKLOG:
+                extra = len(queue)
+                queue.clear()
+
+            welcome_last_sent[guild_str] = time.time()
+            await send_welcome(channel, batch, extra)
+    finally:
+        welcome_flush_tasks.pop(guild_str, None)
+
+# Sharding
+SHARD_RATE_WINDOW = 60  # seconds per event-rate sample
+
+shard_events = {}  # {shard_id: [total_events, window_start, window_events, events_last_window]}
+shard_status = {}  # {shard_id: (status, since_timestamp)}
+
+def shard_id_for(guild_id):
+    """Get the shard a guild's events arrive on"""
+    return (int(guild_id) >> 22) % (bot.shard_count or 1)
+
+def guilds_by_shard():
+    """Group this bot's guilds by shard so background work can run one shard at a time"""
+    partitions = {}
+    for guild in bot.guilds:
+        partitions.setdefault(guild.shard_id or 0, []).append(guild)
+    return partitions
+
+def record_shard_event(guild):
+    shard_id = guild.shard_id if guild else 0
+    counters = shard_events.get(shard_id)
+    now = time.time()
+    if counters is None:
+        counters = shard_events[shard_id] = [0, now, 0, 0]
+
+    if now - counters[1] >= SHARD_RATE_WINDOW:
+        counters[3] = counters[2] if now - counters[1] < 2 * SHARD_RATE_WINDOW else 0
+        counters[1] = now
+        counters[2] = 0
+    counters[0] += 1
+    counters[2] += 1
+
+@bot.event
+async def on_shard_connect(shard_id):
+    shard_status[shard_id] = ('connected', time.time())
+
+@bot.event
+async def on_shard_disconnect(shard_id):
+    shard_status[shard_id] = ('disconnected', time.time())
+
+@bot.event
+async def on_shard_resumed(shard_id):
+    shard_status[shard_id] = ('resumed', time.time())
+
+@bot.listen('on_interaction')
+async def count_interaction(interaction):
+    record_shard_event(interaction.guild)
+
+@bot.command()
+async def shards(ctx):
+    """Show latency, guild count and event rate for each shard"""
+    if not await is_staff(ctx):
+        await ctx.send("You don't have permission to use this command.")
+        return
+
+    latencies = dict(bot.latencies) if SHARDING else {0: bot.latency}
+    partitions = guilds_by_shard()
+    embed = discord.Embed(
+        title="🛰️ Shards",
+        description=f"**{len(latencies)}** shard(s), this server is on shard **{ctx.guild.shard_id or 0}**",
+        color=0x3498db,
+        timestamp=datetime.now()
+    )
+    for shard_id, latency in sorted(latencies.items())[:25]:
+        total, _, current, last = shard_events.get(shard_id, [0, 0, 0, 0])
+        status, since = shard_status.get(shard_id, ('connected', None))
+        latency_text = f"{latency * 1000:.0f} ms" if latency == latency and latency != float('inf') else "n/a"
+        value = f"Latency: {latency_text}\nGuilds: {len(partitions.get(shard_id, []))}\n"
+        value += f"Events: {last}/min last window, {current} this window, {total} total\n"
+        value += f"Status: {status}" + (f" <t:{int(since)}:R>" if since else "")
+        embed.add_field(name=f"Shard {shard_id}", value=value, inline=True)
+    await ctx.send(embed=embed)
+
+# Member cache
+MEMBER_LOOKUP_CACHE_SIZE = 2000
+QUERY_MEMBERS_BATCH = 100  # most user IDs one query_members request accepts
+
+member_lookup_cache = OrderedDict()  # {(guild_id, user_id): Member or None} fetched on demand, least recently used first
+prepared_member_caches = set()  # guild IDs whose member cache was filled this session
+absent_members = set()  # {(guild_id, user_id)} query_members didn't find, not queried again this session
+
+def get_data_holder_ids(guild_id):
+    """Get the IDs of members the bot stores anything for in a guild"""
+    guild_str = str(guild_id)
+    user_ids = set(sp_data.get(guild_str, {})) | set(bracket_roles.get(guild_str, {})) | set(ratings.get(guild_str, {}))
+    user_ids |= set(player_stats.get(guild_str, {})) | set(player_teams.get(guild_str, {}))
+
+    prefix = f"{guild_id}_"
+    for file_name in ('user_accounts.json', 'user_levels.json'):
+        user_ids.update(key[len(prefix):] for key in load_json(file_name) if key.startswith(prefix))
+    return {int(user_id) for user_id in user_ids if str(user_id).isdigit()}
+
+async def prepare_member_cache(guild):
+    """Fill a guild's member cache according to MEMBER_CACHE_MODE"""
+    if MEMBER_CACHE_MODE == 'full' or guild.id in prepared_member_caches:
+        return
+    prepared_member_caches.add(guild.id)
+
+    try:
+        if MEMBER_CACHE_MODE == 'limit' and (guild.member_count or 0) <= MEMBER_CACHE_GUILD_LIMIT:
+            await guild.chunk()
+            return
+
+        await cache_members(guild, get_data_holder_ids(guild.id))
+    except (discord.HTTPException, asyncio.TimeoutError) as e:
+        print(f"Error preparing member cache for {guild.name}: {e}")
+
+async def cache_members(guild, user_ids):
+    """Add members to the guild's member cache in batches, remembering the ones that aren't in the guild"""
+    missing = [user_id for user_id in user_ids if not guild.get_member(user_id) and (guild.id, user_id) not in absent_members]
+    for start in range(0, len(missing), QUERY_MEMBERS_BATCH):
+        batch = missing[start:start + QUERY_MEMBERS_BATCH]
+        await guild.query_members(user_ids=batch, limit=QUERY_MEMBERS_BATCH, cache=True)
+        absent_members.update((guild.id, user_id) for user_id in batch if not guild.get_member(user_id))
+
+async def resolve_member(guild, user_id):
+    """Get a member from the cache, fetching and remembering members that weren't loaded"""
+    member = guild.get_member(user_id)
+    if member or MEMBER_CACHE_MODE == 'full':
+        return member
+
+    key = (guild.id, user_id)
+    if key in member_lookup_cache:
+        member_lookup_cache.move_to_end(key)
+        return member_lookup_cache[key]
+
+    try:
+        member = await guild.fetch_member(user_id)
+    except discord.NotFound:
+        member = None  # remembered too, so members who left don't cost a request every time
+
+    member_lookup_cache[key] = member
+    if len(member_lookup_cache) > MEMBER_LOOKUP_CACHE_SIZE:
+        member_lookup_cache.popitem(last=False)
+    return member
+
+def member_cache_summary():
+    """Describe how many members are cached compared to the guilds' sizes"""
+    cached = sum(len(guild.members) for guild in bot.guilds)
+    total = sum(guild.member_count or 0 for guild in bot.guilds)
+    share = f"{cached / total:.1%}" if total else "n/a"
+    return f"{cached:,} of {total:,} members cached ({share}), {len(member_lookup_cache)} on-demand lookups"
+
+@bot.command()
+async def membercache(ctx):
+    """Show the member cache policy and how much of each guild is held in memory"""
+    if not await is_staff(ctx):
+        await ctx.send("You don't have permission to use this command.")
+        return
+
+    embed = discord.Embed(
+        title="🧠 Member Cache",
+        description=f"**Mode:** {MEMBER_CACHE_MODE}\n{member_cache_summary()}",
+        color=0x3498db
+    )
+    guild = ctx.guild
+    embed.add_field(name="This Server", value=f"{len(guild.members):,} of {guild.member_count or 0:,} members cached", inline=False)
+    if MEMBER_CACHE_MODE != 'full':
+        embed.add_field(name="Members With Bot Data", value=f"{len(get_data_holder_ids(guild.id)):,}", inline=False)
+    await ctx.send(embed=embed)
+
+# Metrics
+def render_metrics():
+    """Build the /metrics page in the Prometheus text format"""
+    lines = [
+        f"pikaa_ready {int(bot.is_ready())}",
+        f"pikaa_guilds {len(bot.guilds)}",
+        f"pikaa_cached_members {sum(len(guild.members) for guild in bot.guilds)}",
+        f"pikaa_member_lookup_cache {len(member_lookup_cache)}",
+        f"pikaa_active_tournaments {sum(1 for tournament in tournaments.values() if tournament.active)}",
+        f"pikaa_pending_timers {len(timer_jobs)}",
+        f"pikaa_log_queue_embeds {sum(len(queue['embeds']) for queue in log_queues.values())}",
+    ]
+    latencies = dict(bot.latencies) if SHARDING else {0: bot.latency}
+    for shard_id, latency in sorted(latencies.items()):
+        if latency == latency and latency != float('inf'):
+            lines.append(f'pikaa_shard_latency_seconds{{shard="{shard_id}"}} {latency:.4f}')
+    for shard_id, (total, _, _, last) in sorted(shard_events.items()):
+        lines.append(f'pikaa_shard_events_total{{shard="{shard_id}"}} {total}')
+        lines.append(f'pikaa_shard_events_per_minute{{shard="{shard_id}"}} {last}')
+    for name, value in sorted(counters.items()):
+        lines.append(f'pikaa_counter_total{{name="{name}"}} {value}')
+    for name, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS + ('+Inf',), histogram.counts):
+            cumulative += bucket_count
+            lines.append(f'pikaa_latency_seconds_bucket{{name="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'pikaa_latency_seconds_sum{{name="{name}"}} {histogram.total:.6f}')
+        lines.append(f'pikaa_latency_seconds_count{{name="{name}"}} {histogram.count}')
+    for phase, seconds in startup_timings.items():
+        lines.append(f'pikaa_startup_seconds{{phase="{phase}"}} {seconds:.4f}')
+    for site, (times_seen, worst, _) in loop_blockers.items():
+        lines.append(f'pikaa_loop_blocked_total{{site="{site}"}} {times_seen}')
+        lines.append(f'pikaa_loop_blocked_seconds_max{{site="{site}"}} {worst:.3f}')
+    return lines
+
+# Loop monitor
+LOOP_LAG_INTERVAL = 0.5  # seconds between heartbeats of the lag probe
+LOOP_BLOCK_THRESHOLD = float(os.getenv('LOOP_BLOCK_THRESHOLD', '0.25'))  # seconds the loop may stall before its stack is sampled
+
+loop_monitor = {'task': None, 'thread': None, 'loop_thread_id': None, 'heartbeat': time.monotonic()}
+loop_blockers = {}  # {"file:function": [times_seen, worst_seconds, last_stack]} filled by the watchdog thread
+
+async def probe_loop_lag():
+    """Sleep a fixed interval and record how late the loop wakes us up"""
+    while True:
+        expected = time.monotonic() + LOOP_LAG_INTERVAL
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        now = time.monotonic()
+        loop_monitor['heartbeat'] = now
+        if METRICS_ENABLED:
+            observe('loop.lag', now - expected)
+
+def watch_loop():
+    """Runs in a daemon thread: when the heartbeat stalls, sample the loop thread's stack to find the blocker"""
+    reported_beat = None
+    while True:
+        time.sleep(LOOP_BLOCK_THRESHOLD / 2)
+        beat = loop_monitor['heartbeat']
+        blocked_for = time.monotonic() - beat - LOOP_LAG_INTERVAL
+        if blocked_for < LOOP_BLOCK_THRESHOLD:
+            continue
+
+        frame = sys._current_frames().get(loop_monitor['loop_thread_id'])
+        if frame is None:
+            continue
+        stack = traceback.extract_stack(frame)
+        del frame
+        # Blame the innermost bot function, library frames below it are just what it called
+        site = next((entry for entry in reversed(stack) if entry.filename == __file__), stack[-1])
+        key = f"{os.path.basename(site.filename)}:{site.name}"
+
+        entry = loop_blockers.setdefault(key, [0, 0.0, None])
+        entry[1] = max(entry[1], blocked_for)
+        entry[2] = ''.join(traceback.format_list(stack[-8:]))
+        if beat != reported_beat:
+            reported_beat = beat
+            entry[0] += 1
+            bump_counter('loop.blocked')
+            print(f"⚠️ Event loop blocked for {blocked_for:.2f}s+ in {key} (line {site.lineno})")
+
+def start_loop_monitor():
+    if loop_monitor['task'] is None:
+        loop_monitor['loop_thread_id'] = threading.get_ident()
+        loop_monitor['heartbeat'] = time.monotonic()
+        loop_monitor['task'] = asyncio.create_task(probe_loop_lag())
+    if loop_monitor['thread'] is None:
+        loop_monitor['thread'] = threading.Thread(target=watch_loop, name='loop-watchdog', daemon=True)
+        loop_monitor['thread'].start()
+
+def get_worst_loop_blockers(limit=5):
+    return sorted(loop_blockers.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+
+def format_latency(seconds):
+    return f"≤{seconds * 1000:g}ms" if seconds != float('inf') else f">{LATENCY_BUCKETS[-1]:g}s"
+
+@bot.command()
+async def perfstats(ctx, top: int = 10):
+    """Show the slowest commands, events and views by total time spent"""
+    if not await is_staff(ctx):
+        await ctx.send("You don't have permission to use this command.")
+        return
+
+    if not METRICS_ENABLED:
+        await ctx.send("Metrics are disabled (METRICS=off).")
+        return
+
+    embed = discord.Embed(
+        title="⏱️ Performance Stats",
+        description="Sorted by total time, percentiles are bucket upper bounds.",
+        color=0x3498db,
+        timestamp=datetime.now()
+    )
+    ranked = sorted(histograms.items(), key=lambda item: item[1].total, reverse=True)[:max(1, min(top, 20))]
+    for name, histogram in ranked:
+        value = f"Calls: {histogram.count}\nAvg: {histogram.total / histogram.count * 1000:.1f}ms\n"
+        value += f"p50 {format_latency(histogram.percentile(0.5))} · p95 {format_latency(histogram.percentile(0.95))} · p99 {format_latency(histogram.percentile(0.99))}"
+        embed.add_field(name=name, value=value, inline=False)
+    if counters:
+        counter_text = "\n".join(f"{name}: {value}" for name, value in sorted(counters.items()))
+        embed.add_field(name="Counters", value=counter_text[:1024], inline=False)
+    blockers = get_worst_loop_blockers()
+    if blockers:
+        blocker_text = "\n".join(f"`{site}`: {times_seen}x, worst {worst:.2f}s" for site, (times_seen, worst, _) in blockers)
+        embed.add_field(name="Event Loop Blockers", value=blocker_text[:1024], inline=False)
+    if not ranked and not counters and not blockers:
+        embed.description = "Nothing recorded yet."
+    await ctx.send(embed=embed)
+
+# Profiling
+PROFILE_DIR = 'profiles'
+PROFILE_MAX_SECONDS = 300
+PROFILE_TOP = 15
+
+profile_state = {'running': None}  # 'cpu' or 'mem' while a session is active
+
+def deep_sizeof(obj):
+    """Approximate memory of a container and everything it holds, counting shared objects once.
+
+    Objects of this module's classes (Tournament, Participant, ...) are followed through __dict__ and __slots__,
+    library objects such as members or tasks are counted shallowly so the walk doesn't reach the whole client.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, type):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+        elif type(item).__module__ == __name__:
+            if hasattr(item, '__dict__'):
+                stack.append(vars(item))
+            for cls in type(item).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    if hasattr(item, slot):
+                        stack.append(getattr(item, slot))
+    return total
+
+def get_largest_module_containers(limit):
+    """Size the module-level dicts and lists (sp_data, ratings, caches, ...)"""
+    sizes = [
+        (name, deep_sizeof(value)) for name, value in list(globals().items())
+        if isinstance(value, (dict, list, deque)) and not name.startswith('__') and not name.isupper()
+    ]
+    return sorted(sizes, key=lambda item: item[1], reverse=True)[:limit]
+
+def format_size(size):
+    return f"{size / 1024:.1f} KiB" if size < 1024 * 1024 else f"{size / 1024 / 1024:.2f} MiB"
+
+async def profile_cpu(seconds, path):
+    """Profile everything the event loop runs for a while, returns the hottest functions"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+    profiler.dump_stats(f"{path}.prof")
+
+    stats = pstats.Stats(profiler)
+    hottest = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:PROFILE_TOP]
+    return [
+        f"{own_time * 1000:8.1f}ms own {cumulative * 1000:9.1f}ms cum {calls:7d}x  {func}  ({os.path.basename(filename)}:{line})"
+        for (filename, line, func), (_, calls, own_time, cumulative, _) in hottest
+    ]
+
+async def profile_memory(seconds, path):
+    """Trace allocations for a while, returns the sites that grew the most and the largest module containers"""
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(10)
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    after.dump(f"{path}.snapshot")
+
+    lines = ["Allocation growth by line:"]
+    for stat in after.compare_to(before, 'lineno')[:PROFILE_TOP]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size_diff / 1024:+9.1f} KiB {stat.count_diff:+7d} blocks  {os.path.basename(frame.filename)}:{frame.lineno}")
+    lines.append("")
+    lines.append("Largest allocation sites:")
+    for stat in after.statistics('lineno')[:PROFILE_TOP]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size / 1024:9.1f} KiB {stat.count:7d} blocks  {os.path.basename(frame.filename)}:{frame.lineno}")
+    lines.append("")
+    lines.append("Largest module-level containers:")
+    for name, size in get_largest_module_containers(PROFILE_TOP):
+        lines.append(f"{format_size(size):>12}  {name}")
+    return lines
+
+@bot.command()
+async def profile(ctx, kind: str, seconds: int = 30):
+    """Profile the running bot: !profile cpu|mem <seconds> (owner only)"""
+    if not await bot.is_owner(ctx.author):
+        await ctx.send("You don't have permission to use this command.")
+        return
+
+    kind = kind.lower()
+    if kind not in ('cpu', 'mem') or not 1 <= seconds <= PROFILE_MAX_SECONDS:
+        await ctx.send(f"Usage: `!profile cpu|mem <1-{PROFILE_MAX_SECONDS} seconds>`")
+        return
+    if profile_state['running']:
+        await ctx.send(f"A {profile_state['running']} profile is already running.")
+        return
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{kind}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    profile_state['running'] = kind
+    await ctx.send(f"🔬 Profiling {'CPU' if kind == 'cpu' else 'memory'} for {seconds} seconds...")
+    try:
+        lines = await (profile_cpu if kind == 'cpu' else profile_memory)(seconds, path)
+    finally:
+        profile_state['running'] = None
+
+    report = '\n'.join(lines)
+    with open(f"{path}.txt", 'w') as f:
+        f.write(report + '\n')
+
+    summary = report if len(report) <= 1900 else report[:1900].rsplit('\n', 1)[0] + '\n...'
+    await ctx.send(f"```\n{summary}\n```", file=discord.File(f"{path}.txt"))
+
 # Bot events
+startup_timings = {}  # {phase: seconds} measured once per process
+
+async def run_startup_phase(name, func, *args):
+    """Run one startup step and record how long it took"""
+    started = time.perf_counter()
+    result = func(*args)
+    if asyncio.iscoroutine(result):
+        result = await result
+    startup_timings[name] = time.perf_counter() - started
+    return result
+
 @bot.event
-async def on_ready():
-    print(f'{bot.user} has logged in!')
-    init_db()
-    load_data()
-    if not level_check.is_running():
-        level_check.start()
+async def setup_hook():
+    """One-time startup, runs after login and before the gateway connects, never again on reconnects"""
+    startup_timings['login'] = time.perf_counter() - STARTUP_STARTED
+    await run_startup_phase('init_db', init_db)
+    await run_startup_phase('load_data', load_data)
+    await run_startup_phase('timers', start_timer_dispatcher)
+    start_loop_monitor()
+    if shared_store:
+        sync_shared_store.start()
+    level_check.start()
     
     # Add persistent views for buttons to work after restart
     bot.add_view(TournamentView())
@@ -608,24 +2205,55 @@ async def on_ready():
     bot.add_view(HosterRegistrationView())
     bot.add_view(AccountLinkView())
     
+    await run_startup_phase('health_server', keep_alive, bot, render_metrics, int(os.getenv('PORT', '8080')))
+    # Guild configs, the board registry and the per-feature JSON files are read on first use
+    startup_timings['setup'] = time.perf_counter() - STARTUP_STARTED
+
+async def prepare_member_caches():
+    for guild in bot.guilds:
+        await prepare_member_cache(guild)
+    if MEMBER_CACHE_MODE != 'full':
+        print(f"Member cache ({MEMBER_CACHE_MODE}): {member_cache_summary()}")
+
+@bot.event
+async def on_ready():
+    if 'ready' in startup_timings:
+        # Reconnected with a new session, state in memory is still current
+        print(f'{bot.user} reconnected.')
+        return
+    
+    startup_timings['ready'] = time.perf_counter() - STARTUP_STARTED
+    print(f'{bot.user} has logged in!')
+    phases = ', '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in startup_timings.items() if name not in ('setup', 'ready'))
+    print(f"⏱️ Setup took {startup_timings['setup'] * 1000:.0f}ms ({phases}), ready after {startup_timings['ready']:.2f}s")
+    
+    # Filling member caches can take a while on big guilds, don't hold up anything else for it
+    asyncio.create_task(prepare_member_caches())
+    
     print("🔧 Bot is ready and all systems operational!")
 
 @bot.event
+async def on_guild_join(guild):
+    await prepare_member_cache(guild)
+
+@bot.event
+@timed('event.on_member_join')
 async def on_member_join(member):
-    """Handle new member joins for welcomer system"""
-    guild_id = str(member.guild.id)
+    """Handle new member joins for raid detection and the welcomer system"""
+    record_shard_event(member.guild)
+    absent_members.discard((member.guild.id, member.id))
+    config = get_guild_config(member.guild.id)
     
-    guild_config = load_json('guild_config.json')
-    config = guild_config.get(guild_id, {})
+    if config.raid_enabled and record_join(member, config):
+        await trigger_raid_response(member.guild, config)
     
-    if config.get('welcomer_enabled') and config.get('welcomer_channel'):
-        channel = bot.get_channel(config['welcomer_channel'])
-        if channel:
-            welcome_message = f"Welcome! <@{member.id}> Thanks for joining my server you are **GOAT** <:w_trkis:1400194042234667120> <:GOAT:1400194575125188811>"
-            await channel.send(welcome_message)
+    if not welcomes_paused(member.guild.id, config):
+        await queue_welcome(member, config)
 
 @bot.event
+@timed('event.on_message')
 async def on_message(message):
+    record_shard_event(message.guild)
     if message.author.bot:
         return
     
@@ -660,6 +2288,7 @@ async def on_message(message):
     
     await bot.process_commands(message)
 
+@timed('event.process_leveling')
 async def process_leveling(message):
     """Process user leveling system"""
     if not message.guild:
@@ -700,11 +2329,10 @@ async def handle_level_up(message, new_level):
     guild_id = str(message.guild.id)
     user_id = message.author.id
     
-    guild_config = load_json('guild_config.json')
-    config = guild_config.get(guild_id, {}) if isinstance(guild_config, dict) else {}
+    config = get_guild_config(guild_id)
     
-    if config.get('leveling_channel'):
-        channel = bot.get_channel(config['leveling_channel'])
+    if config.leveling_channel:
+        channel = bot.get_channel(config.leveling_channel)
         if channel and hasattr(channel, 'send'):
             await channel.send(
                 f"**Thanks For Showing Your Activity <@{user_id}>! You just Stumbled Up To Level **{new_level}**. Keep GOING!!!!!** <:abilities:1402690411759407185>"
@@ -722,27 +2350,31 @@ async def handle_level_up(message, new_level):
                 except:
                     pass
 
+@timed('event.process_automod')
 async def process_automod(message):
     """Process automod checks"""
     if not message.guild or message.author.guild_permissions.manage_messages:
         return
     
-    guild_id = str(message.guild.id)
-    guild_config = load_json('guild_config.json')
-    config = guild_config.get(guild_id, {}) if isinstance(guild_config, dict) else {}
+    config = get_guild_config(message.guild.id)
     
-    if not config.get('automod_enabled'):
+    if not config.automod_enabled:
         return
     
-    spam_channels = config.get('spam_channels', '').split(',')
-    link_channels = config.get('link_channels', '').split(',')
-    
     violations = []
     
     # Check spam (if not in spam channel)
-    if str(message.channel.id) not in spam_channels:
+    if message.channel.id not in config.spam_channels:
         if await check_spam(message):
             violations.append("spam")
+        
+        # Check the same content posted across channels
+        if await check_cross_channel_duplicates(message, config):
+            violations.append("cross-channel spam")
+    
+    # Check mention, attachment and message floods
+    for kind in await check_floods(message, config):
+        violations.append(f"{kind} spam")
     
     # Check emoji spam
     if await check_emoji_spam(message):
@@ -753,17 +2385,19 @@ async def process_automod(message):
         violations.append("inappropriate language")
     
     # Check links (if not in link channel)
-    if str(message.channel.id) not in link_channels:
+    if message.channel.id not in config.link_channels:
         if await check_links(message.content):
             violations.append("unauthorized links")
     
     if violations:
-        await handle_automod_violation(message, violations, config.get('automod_log_channel'))
+        await handle_automod_violation(message, violations, config.automod_log_channel)
 
 async def handle_automod_violation(message, violations, log_channel_id):
     """Handle automod violations"""
     user_id = str(message.author.id)
     guild_id = str(message.guild.id)
+    for violation in violations:
+        bump_counter(f"automod.{violation.replace(' ', '_')}")
     
     automod_warnings = load_json('automod_warnings.json')
     key = f"{guild_id}_{user_id}"
@@ -799,7 +2433,7 @@ async def handle_automod_violation(message, violations, log_channel_id):
             embed.add_field(name="Channel", value=f"{message.channel.mention}", inline=True)
             embed.add_field(name="Violations", value=", ".join(violations), inline=True)
             embed.add_field(name="Warning Count", value=f"{warning_count}/3", inline=True)
-            await log_channel.send(embed=embed)
+            queue_log(log_channel, embed)
     
     if warning_count >= 3:
         try:
@@ -824,6 +2458,150 @@ async def handle_automod_violation(message, violations, log_channel_id):
             except:
                 pass
 
+# Timer scheduler for timed actions (temporary bans, ...)
+TIMERS_FILE = f'timers.{CLUSTER_ID}.jsonl' if CLUSTER_ID else 'timers.jsonl'  # one log per cluster process
+TIMER_MAX_SLEEP = 3600  # re-check at least hourly so wall clock jumps can't delay jobs for long
+timer_jobs = {}  # {job_id: {'id': str, 'action': str, 'due': timestamp, ...payload}}
+timer_heap = []  # [(due, job_id)] min-heap of pending jobs, cancelled jobs are skipped lazily
+timer_handlers = {}  # {action: async handler(job)}
+timer_keys = {}  # {key: job_id} so a job can be found and cancelled by what it's about, e.g. "unban:guild:user"
+timer_state = {'task': None, 'wakeup': None}
+TIMER_RETRY_DELAY = 30  # first retry delay in seconds, doubled on every failed attempt
+TIMER_MAX_RETRY_DELAY = 3600
+TIMER_MAX_ATTEMPTS = 24
+
+class TimerRetry(Exception):
+    """Raised by a timer handler when the job can't run yet and should be retried later"""
+
+def timer_handler(action):
+    """Register the coroutine that runs jobs of the given action"""
+    def decorator(func):
+        timer_handlers[action] = func
+        return func
+    return decorator
+
+def append_timer_log(entry):
+    """Append one add/done record to the timer log"""
+    with open(TIMERS_FILE, 'a') as f:
+        f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+def load_timers():
+    """Replay the timer log into the pending job heap and compact the log"""
+    timer_jobs.clear()
+    try:
+        with open(TIMERS_FILE, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from a crash
+                if entry.get('op') == 'add':
+                    timer_jobs[entry['job']['id']] = entry['job']
+                elif entry.get('op') == 'done':
+                    timer_jobs.pop(entry.get('id'), None)
+    except FileNotFoundError:
+        pass
+
+    timer_keys.clear()
+    for job_id, job in timer_jobs.items():
+        if job.get('key'):
+            timer_keys[job['key']] = job_id
+
+    timer_heap[:] = [(job['due'], job_id) for job_id, job in timer_jobs.items()]
+    heapq.heapify(timer_heap)
+
+    with open(TIMERS_FILE, 'w') as f:
+        for job in timer_jobs.values():
+            f.write(json.dumps({'op': 'add', 'job': job}, separators=(',', ':')) + '\n')
+
+def add_timer_job(job):
+    """Persist and queue a job (new or rescheduled)"""
+    timer_jobs[job['id']] = job
+    if job.get('key'):
+        timer_keys[job['key']] = job['id']
+    heapq.heappush(timer_heap, (job['due'], job['id']))
+    append_timer_log({'op': 'add', 'job': job})
+
+    # Wake the dispatcher if this job is now the next one due
+    if timer_state['wakeup'] and timer_heap[0][1] == job['id']:
+        timer_state['wakeup'].set()
+
+def schedule_timer(action, due, key=None, **payload):
+    """Persist a job to run at the due timestamp, replacing any pending job with the same key"""
+    if key:
+        cancel_timer_key(key)
+    job_id = os.urandom(8).hex()
+    job = {'id': job_id, 'action': action, 'due': due, **payload}
+    if key:
+        job['key'] = key
+    add_timer_job(job)
+    return job_id
+
+def cancel_timer(job_id):
+    """Cancel a pending job"""
+    job = timer_jobs.pop(job_id, None)
+    if job:
+        if job.get('key') and timer_keys.get(job['key']) == job_id:
+            del timer_keys[job['key']]
+        append_timer_log({'op': 'done', 'id': job_id})
+
+def cancel_timer_key(key):
+    """Cancel the pending job with this key, if any"""
+    job_id = timer_keys.get(key)
+    if job_id:
+        cancel_timer(job_id)
+
+async def run_timer_dispatcher():
+    """Sleep until the next job is due, run it, repeat. Overdue jobs run right away."""
+    await bot.wait_until_ready()
+    wakeup = timer_state['wakeup']
+
+    while True:
+        while timer_heap and timer_heap[0][1] not in timer_jobs:
+            heapq.heappop(timer_heap)
+
+        now = time.time()
+        if timer_heap and timer_heap[0][0] <= now:
+            _, job_id = heapq.heappop(timer_heap)
+            job = timer_jobs.pop(job_id)
+            if job.get('key') and timer_keys.get(job['key']) == job_id:
+                del timer_keys[job['key']]
+            handler = timer_handlers.get(job['action'])
+            try:
+                if handler:
+                    await handler(job)
+                else:
+                    print(f"No timer handler for action: {job['action']}")
+            except (TimerRetry, discord.HTTPException) as e:
+                # Transient failures (guild unavailable, Discord 5xx) are retried, permanent ones are not
+                attempts = job.get('attempts', 0) + 1
+                if isinstance(e, (discord.Forbidden, discord.NotFound)) or attempts >= TIMER_MAX_ATTEMPTS:
+                    print(f"Giving up on timer {job['action']} after {attempts} attempt(s): {e}")
+                elif not (job.get('key') and job['key'] in timer_keys):
+                    delay = min(TIMER_RETRY_DELAY * 2 ** (attempts - 1), TIMER_MAX_RETRY_DELAY)
+                    print(f"Retrying timer {job['action']} in {delay}s: {e}")
+                    add_timer_job({**job, 'due': time.time() + delay, 'attempts': attempts})
+                    continue
+            except Exception as e:
+                print(f"Error running timer {job['action']}: {e}")
+            append_timer_log({'op': 'done', 'id': job_id})
+            continue
+
+        timeout = min(timer_heap[0][0] - now, TIMER_MAX_SLEEP) if timer_heap else TIMER_MAX_SLEEP
+        wakeup.clear()
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+def start_timer_dispatcher():
+    """Load persisted jobs and start the dispatcher task once"""
+    if timer_state['task'] is None:
+        load_timers()
+        timer_state['wakeup'] = asyncio.Event()
+        timer_state['task'] = asyncio.create_task(run_timer_dispatcher())
+        print(f"⏰ Timer scheduler started with {len(timer_jobs)} pending job(s)")
+
 # MODERATION COMMANDS
 @bot.command()
 async def warn(ctx, member: discord.Member, *, reason="No reason provided"):
@@ -984,6 +2762,8 @@ async def ban(ctx, member: discord.Member, time_str: str = None, *, reason="No r
     
     try:
         await member.ban(reason=f"Banned by {ctx.author.name}: {reason}")
+        # A new ban replaces any earlier temporary one, it must not be lifted by a stale timer
+        cancel_timer_key(f"unban:{ctx.guild.id}:{member.id}")
         
         embed = discord.Embed(
             title="User Banned",
@@ -998,7 +2778,7 @@ async def ban(ctx, member: discord.Member, time_str: str = None, *, reason="No r
             duration = parse_time(time_str)
             if duration:
                 embed.add_field(name="Duration", value=time_str, inline=True)
-                asyncio.create_task(schedule_unban(ctx.guild, member, duration))
+                schedule_timer('unban', time.time() + duration.total_seconds(), key=f"unban:{ctx.guild.id}:{member.id}", guild_id=ctx.guild.id, user_id=member.id)
         
         await ctx.send(embed=embed)
         
@@ -1007,35 +2787,89 @@ async def ban(ctx, member: discord.Member, time_str: str = None, *, reason="No r
     except Exception as e:
         await ctx.send(f"Error banning user: {str(e)}")
 
-async def schedule_unban(guild, member, duration):
-    """Schedule automatic unban"""
-    await asyncio.sleep(duration.total_seconds())
+@timer_handler('unban')
+async def expire_temporary_ban(job):
+    """Lift a temporary ban when its timer is due"""
+    guild = bot.get_guild(job['guild_id'])
+    if not guild:
+        raise TimerRetry(f"guild {job['guild_id']} is unavailable")
     try:
-        await guild.unban(member, reason="Temporary ban expired")
-    except:
-        pass
+        await guild.unban(discord.Object(id=job['user_id']), reason="Temporary ban expired")
+    except discord.NotFound:
+        pass  # Already unbanned by hand
+
+# Ban name index so !unban by name doesn't have to page through the whole ban list
+ban_index = {}  # {guild_id: {lowercase_name: user_id}}
+banned_names = {}  # {guild_id: {user_id: {lowercase_names}}} reverse of ban_index so unbans don't scan it
+
+def index_ban(guild_id, user):
+    """Remember a banned user's name"""
+    names = ban_index.setdefault(str(guild_id), {})
+    user_names = banned_names.setdefault(str(guild_id), {}).setdefault(user.id, set())
+    for name in (user.name.lower(), str(user).lower()):
+        names[name] = user.id
+        user_names.add(name)
+
+def unindex_ban(guild_id, user_id):
+    """Forget a user that is no longer banned"""
+    names = ban_index.get(str(guild_id), {})
+    for name in banned_names.get(str(guild_id), {}).pop(user_id, ()):
+        # The name may have been taken over by another banned user since
+        if names.get(name) == user_id:
+            del names[name]
+
+async def find_banned_user(guild, member_name):
+    """Find a banned user by name, streaming the ban list only on an index miss"""
+    name = member_name.lower()
+    user_id = ban_index.get(str(guild.id), {}).get(name)
+    if user_id:
+        try:
+            ban_entry = await guild.fetch_ban(discord.Object(id=user_id))
+            return ban_entry.user
+        except discord.NotFound:
+            unindex_ban(guild.id, user_id)  # Unbanned while we weren't watching
+
+    async for ban_entry in guild.bans(limit=None):
+        index_ban(guild.id, ban_entry.user)
+        if ban_entry.user.name.lower() == name or str(ban_entry.user).lower() == name:
+            return ban_entry.user
+    return None
+
+@bot.event
+async def on_member_ban(guild, user):
+    index_ban(guild.id, user)
+
+@bot.event
+async def on_member_unban(guild, user):
+    unindex_ban(guild.id, user.id)
+    cancel_timer_key(f"unban:{guild.id}:{user.id}")
 
 @bot.command()
 async def unban(ctx, *, member_name):
-    """Unban a user"""
+    """Unban a user by ID, mention or name"""
     if not await is_staff(ctx):
         await ctx.send("You don't have permission to use this command.")
         return
     
-    banned_users = [entry async for entry in ctx.guild.bans()]
-    
-    for ban_entry in banned_users:
-        user = ban_entry.user
-        if user.name.lower() == member_name.lower() or str(user) == member_name:
-            try:
-                await ctx.guild.unban(user, reason=f"Unbanned by {ctx.author.name}")
-                await ctx.send(f"{user} has been unbanned.")
-                return
-            except Exception as e:
-                await ctx.send(f"Error unbanning user: {str(e)}")
-                return
+    id_match = re.fullmatch(r'<@!?(\d+)>|(\d{15,20})', member_name.strip())
+    if id_match:
+        user = discord.Object(id=int(id_match.group(1) or id_match.group(2)))
+        user_display = f"<@{user.id}>"
+    else:
+        user = await find_banned_user(ctx.guild, member_name)
+        if user is None:
+            await ctx.send(f"User '{member_name}' not found in ban list.")
+            return
+        user_display = str(user)
     
-    await ctx.send(f"User '{member_name}' not found in ban list.")
+    try:
+        await ctx.guild.unban(user, reason=f"Unbanned by {ctx.author.name}")
+        unindex_ban(ctx.guild.id, user.id)
+        await ctx.send(f"{user_display} has been unbanned.")
+    except discord.NotFound:
+        await ctx.send(f"User '{member_name}' not found in ban list.")
+    except Exception as e:
+        await ctx.send(f"Error unbanning user: {str(e)}")
 
 @bot.command()
 async def kick(ctx, member: discord.Member, *, reason="No reason provided"):
@@ -1062,6 +2896,155 @@ async def kick(ctx, member: discord.Member, *, reason="No reason provided"):
     except Exception as e:
         await ctx.send(f"Error kicking user: {str(e)}")
 
+# Bulk moderation
+BULK_WORKERS = 4  # concurrent API calls, discord.py queues anything beyond the route's rate-limit bucket
+BULK_MAX_TARGETS = 500
+BULK_PROGRESS_INTERVAL = 3  # seconds between progress message edits
+
+async def resolve_bulk_targets(ctx, members, args):
+    """Collect targets from mentions and an optional leading 'joined:<time>' filter, returns (targets, reason, filter)"""
+    reason = args or "No reason provided"
+    joined_filter = None
+
+    if args and args.split()[0].lower().startswith('joined:'):
+        joined_filter, _, rest = args.partition(' ')
+        window = parse_time(joined_filter.split(':', 1)[1])
+        if not window:
+            await ctx.send("Invalid joined filter. Use e.g. `joined:10m` or `joined:2h`.")
+            return None, None, None
+        reason = rest.strip() or "No reason provided"
+
+        cutoff = discord.utils.utcnow() - window
+        members = list(members) + [member for member in ctx.guild.members if member.joined_at and member.joined_at >= cutoff]
+
+    # Never act on the moderator, the bot itself, other staff or anyone at or above the moderator's top role
+    staff_roles = get_permission_roles(ctx.guild.id)['staff']
+    targets = {}
+    for member in members:
+        if member.id in (ctx.author.id, bot.user.id) or member.guild_permissions.manage_messages:
+            continue
+        if not staff_roles.isdisjoint(get_member_role_ids(member)):
+            continue
+        if ctx.author.id != ctx.guild.owner_id and member.top_role >= ctx.author.top_role:
+            continue
+        targets[member.id] = member
+
+    if not targets:
+        await ctx.send("No members matched.")
+        return None, None, None
+    if len(targets) > BULK_MAX_TARGETS:
+        await ctx.send(f"Too many members matched ({len(targets)}). The limit is {BULK_MAX_TARGETS} per command.")
+        return None, None, None
+
+    return list(targets.values()), reason, joined_filter
+
+async def run_bulk_action(ctx, title, targets, reason, joined_filter, action):
+    """Run action(member) over targets with a bounded worker pool and post one summary embed"""
+    queue = asyncio.Queue()
+    for member in targets:
+        queue.put_nowait(member)
+
+    succeeded = []
+    failed = []
+    progress = await ctx.send(f"⏳ {title}: 0/{len(targets)}")
+    last_progress = time.monotonic()
+
+    async def worker():
+        nonlocal last_progress
+        while not queue.empty():
+            member = queue.get_nowait()
+            try:
+                await action(member)
+                succeeded.append(member)
+            except Exception as e:
+                failed.append((member, str(e)))
+
+            if time.monotonic() - last_progress >= BULK_PROGRESS_INTERVAL:
+                last_progress = time.monotonic()
+                try:
+                    await progress.edit(content=f"⏳ {title}: {len(succeeded) + len(failed)}/{len(targets)}")
+                except discord.HTTPException:
+                    pass
+
+    await asyncio.gather(*(worker() for _ in range(min(BULK_WORKERS, len(targets)))))
+
+    try:
+        await progress.delete()
+    except discord.HTTPException:
+        pass
+
+    embed = discord.Embed(
+        title=f"{title} Complete",
+        color=0xff0000 if failed else 0x00ff00,
+        timestamp=datetime.now()
+    )
+    embed.add_field(name="Succeeded", value=str(len(succeeded)), inline=True)
+    embed.add_field(name="Failed", value=str(len(failed)), inline=True)
+    embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+    if joined_filter:
+        embed.add_field(name="Filter", value=joined_filter, inline=True)
+    embed.add_field(name="Reason", value=reason, inline=False)
+    if failed:
+        failures = "\n".join(f"{member} - {error}" for member, error in failed[:10])
+        if len(failed) > 10:
+            failures += f"\n... and {len(failed) - 10} more"
+        embed.add_field(name="Failures", value=failures[:1024], inline=False)
+    await ctx.send(embed=embed)
+
+@bot.command()
+async def massban(ctx, members: commands.Greedy[discord.Member], *, args=None):
+    """Ban many users at once: !massban @a @b [joined:10m] [reason]"""
+    if not await is_staff(ctx):
+        await ctx.send("You don't have permission to use this command.")
+        return
+
+    targets, reason, joined_filter = await resolve_bulk_targets(ctx, members, args)
+    if not targets:
+        return
+
+    async def action(member):
+        await member.ban(reason=f"Mass ban by {ctx.author.name}: {reason}")
+        cancel_timer_key(f"unban:{ctx.guild.id}:{member.id}")
+
+    await run_bulk_action(ctx, "Mass Ban", targets, reason, joined_filter, action)
+
+@bot.command()
+async def masskick(ctx, members: commands.Greedy[discord.Member], *, args=None):
+    """Kick many users at once: !masskick @a @b [joined:10m] [reason]"""
+    if not await is_staff(ctx):
+        await ctx.send("You don't have permission to use this command.")
+        return
+
+    targets, reason, joined_filter = await resolve_bulk_targets(ctx, members, args)
+    if not targets:
+        return
+
+    async def action(member):
+        await member.kick(reason=f"Mass kick by {ctx.author.name}: {reason}")
+
+    await run_bulk_action(ctx, "Mass Kick", targets, reason, joined_filter, action)
+
+@bot.command()
+async def masstimeout(ctx, time_str: str, members: commands.Greedy[discord.Member], *, args=None):
+    """Time out many users at once: !masstimeout 1h @a @b [joined:10m] [reason]"""
+    if not await is_staff(ctx):
+        await ctx.send("You don't have permission to use this command.")
+        return
+
+    duration = parse_time(time_str)
+    if not duration or duration < timedelta(minutes=1) or duration > timedelta(days=7):
+        await ctx.send("Timeout duration must be between 1 minute and 7 days (e.g., 30m, 2h, 1d).")
+        return
+
+    targets, reason, joined_filter = await resolve_bulk_targets(ctx, members, args)
+    if not targets:
+        return
+
+    async def action(member):
+        await member.timeout(duration, reason=f"Mass timeout by {ctx.author.name}: {reason}")
+
+    await run_bulk_action(ctx, f"Mass Timeout ({time_str})", targets, reason, joined_filter, action)
+
 # Configuration Commands
 @bot.command()
 async def welcomer_enable(ctx, channel: discord.TextChannel):
@@ -1070,17 +3053,24 @@ async def welcomer_enable(ctx, channel: discord.TextChannel):
         await ctx.send("You don't have permission to use this command.")
         return
     
-    guild_config = load_json('guild_config.json')
-    guild_id = str(ctx.guild.id)
+    get_guild_config(ctx.guild.id).update(welcomer_enabled=True, welcomer_channel=channel.id)
+    
+    await ctx.send(f"Welcomer system has been enabled! Welcome messages will be sent to {channel.mention}.")
+
+@bot.command()
+async def welcomer_batch(ctx, size: int, seconds: float):
+    """Set how many members one welcome message can mention and how often batches are sent"""
+    if not await is_staff(ctx):
+        await ctx.send("You don't have permission to use this command.")
+        return
     
-    if guild_id not in guild_config:
-        guild_config[guild_id] = {}
+    if not 1 <= size <= WELCOME_MAX_BATCH or not 1 <= seconds <= 300:
+        await ctx.send(f"Usage: `!welcomer_batch <1-{WELCOME_MAX_BATCH} members> <1-300 seconds>`")
+        return
     
-    guild_config[guild_id]['welcomer_enabled'] = True
-    guild_config[guild_id]['welcomer_channel'] = channel.id
-    save_json('guild_config.json', guild_config)
+    get_guild_config(ctx.guild.id).update(welcome_batch_size=size, welcome_batch_interval=seconds)
     
-    await ctx.send(f"Welcomer system has been enabled! Welcome messages will be sent to {channel.mention}.")
+    await ctx.send(f"Welcome messages will mention up to {size} members, at most once every {seconds:g} seconds.")
 
 @bot.command()
 async def automod_enable(ctx):
@@ -1089,14 +3079,7 @@ async def automod_enable(ctx):
         await ctx.send("You don't have permission to use this command.")
         return
     
-    guild_config = load_json('guild_config.json')
-    guild_id = str(ctx.guild.id)
-    
-    if guild_id not in guild_config:
-        guild_config[guild_id] = {}
-    
-    guild_config[guild_id]['automod_enabled'] = True
-    save_json('guild_config.json', guild_config)
+    get_guild_config(ctx.guild.id).update(automod_enabled=True)
     
     await ctx.send("Automod has been enabled for this server.")
 
@@ -1107,16 +3090,40 @@ async def automod_log(ctx, channel: discord.TextChannel):
         await ctx.send("You don't have permission to use this command.")
         return
     
-    guild_config = load_json('guild_config.json')
-    guild_id = str(ctx.guild.id)
+    get_guild_config(ctx.guild.id).update(automod_log_channel=channel.id)
+    
+    await ctx.send(f"Automod log channel set to {channel.mention}.")
+
+@bot.command()
+async def automod_duplicates(ctx, channels: int, seconds: int):
+    """Flag the same message posted in this many channels within this many seconds"""
+    if not await is_staff(ctx):
+        await ctx.send("You don't have permission to use this command.")
+        return
     
-    if guild_id not in guild_config:
-        guild_config[guild_id] = {}
+    if not 2 <= channels <= 25 or not 5 <= seconds <= 3600:
+        await ctx.send("Usage: `!automod_duplicates <2-25 channels> <5-3600 seconds>`")
+        return
     
-    guild_config[guild_id]['automod_log_channel'] = channel.id
-    save_json('guild_config.json', guild_config)
+    get_guild_config(ctx.guild.id).update(duplicate_channels=channels, duplicate_window=seconds)
     
-    await ctx.send(f"Automod log channel set to {channel.mention}.")
+    await ctx.send(f"Automod will flag the same message posted in {channels} channels within {seconds} seconds.")
+
+@bot.command()
+async def automod_flood(ctx, kind: str, limit: int, seconds: int):
+    """Set how many mentions, attachments or messages a member can send within a window"""
+    if not await is_staff(ctx):
+        await ctx.send("You don't have permission to use this command.")
+        return
+    
+    kind = kind.lower().rstrip('s')
+    if kind not in FLOOD_DEFAULTS or not 1 <= limit <= 100 or not 1 <= seconds <= 3600:
+        await ctx.send("Usage: `!automod_flood <mentions|attachments|messages> <1-100> <1-3600 seconds>`")
+        return
+    
+    get_guild_config(ctx.guild.id).update(**{f'{kind}_limit': limit, f'{kind}_window': seconds})
+    
+    await ctx.send(f"Automod will flag more than {limit} {kind}s within {seconds} seconds.")
 
 @bot.command()
 async def spam(ctx, *channels: discord.TextChannel):
@@ -1127,14 +3134,7 @@ async def spam(ctx, *channels: discord.TextChannel):
     
     channel_ids = ','.join(str(ch.id) for ch in channels)
     
-    guild_config = load_json('guild_config.json')
-    guild_id = str(ctx.guild.id)
-    
-    if guild_id not in guild_config:
-        guild_config[guild_id] = {}
-    
-    guild_config[guild_id]['spam_channels'] = channel_ids
-    save_json('guild_config.json', guild_config)
+    get_guild_config(ctx.guild.id).update(spam_channels=channel_ids)
     
     channel_mentions = ', '.join(ch.mention for ch in channels)
     await ctx.send(f"Spam is now allowed in: {channel_mentions}")
@@ -1148,14 +3148,7 @@ async def link(ctx, *channels: discord.TextChannel):
     
     channel_ids = ','.join(str(ch.id) for ch in channels)
     
-    guild_config = load_json('guild_config.json')
-    guild_id = str(ctx.guild.id)
-    
-    if guild_id not in guild_config:
-        guild_config[guild_id] = {}
-    
-    guild_config[guild_id]['link_channels'] = channel_ids
-    save_json('guild_config.json', guild_config)
+    get_guild_config(ctx.guild.id).update(link_channels=channel_ids)
     
     channel_mentions = ', '.join(ch.mention for ch in channels)
     await ctx.send(f"Links are now allowed in: {channel_mentions}")
@@ -1168,14 +3161,7 @@ async def leveling_channel(ctx, channel: discord.TextChannel):
         await ctx.send("You don't have permission to use this command.")
         return
     
-    guild_config = load_json('guild_config.json')
-    guild_id = str(ctx.guild.id)
-    
-    if guild_id not in guild_config:
-        guild_config[guild_id] = {}
-    
-    guild_config[guild_id]['leveling_channel'] = channel.id
-    save_json('guild_config.json', guild_config)
+    get_guild_config(ctx.guild.id).update(leveling_channel=channel.id)
     
     await ctx.send(f"Leveling announcements will be sent to {channel.mention}.")
 
@@ -1382,6 +3368,173 @@ async def bracketrole(ctx, member: discord.Member, *emojis):
     emoji_display = ''.join(emojis) if emojis else 'None'
     await ctx.send(f"✅ Bracket roles updated for {member.mention}: {emoji_display}")
 
+@bot.command()
+async def rating(ctx, member: discord.Member = None):
+    """View a player's tournament rating"""
+    if member is None:
+        member = ctx.author
+
+    guild_ratings = ratings.get(str(ctx.guild.id), {})
+    current_rating = get_rating(ctx.guild.id, member.id)
+    games = get_rating_games(ctx.guild.id, member.id)
+
+    embed = discord.Embed(
+        title=f"{member.display_name}'s Rating",
+        color=0x9b59b6
+    )
+    embed.add_field(name="Rating", value=f"{current_rating:.0f}", inline=True)
+    embed.add_field(name="Rated Matches", value=str(games), inline=True)
+    if games:
+        rank = 1 + sum(1 for entry in guild_ratings.values() if entry[0] > current_rating)
+        embed.add_field(name="Rank", value=f"#{rank} of {len(guild_ratings)}", inline=True)
+    embed.set_thumbnail(url=member.display_avatar.url)
+
+    await ctx.send(embed=embed)
+
+@bot.command()
+async def rating_lb(ctx):
+    """Show the top rated players"""
+    guild_ratings = ratings.get(str(ctx.guild.id), {})
+    if not guild_ratings:
+        await ctx.send("No rated matches have been played yet.")
+        return
+
+    top = heapq.nlargest(10, guild_ratings.items(), key=lambda item: item[1][0])
+
+    leaderboard = ""
+    for place, (user_str, (user_rating, games)) in enumerate(top, 1):
+        leaderboard += f"**{place}.** <@{user_str}> - {user_rating:.0f} ({games} matches)\n"
+
+    embed = discord.Embed(
+        title="🏅 Rating Leaderboard",
+        description=leaderboard,
+        color=0x9b59b6
+    )
+    await ctx.send(embed=embed)
+
+@bot.command()
+async def stats(ctx, member: discord.Member = None):
+    """View a player's tournament record"""
+    if member is None:
+        member = ctx.author
+
+    wins, losses, podiums, titles = get_player_stats(ctx.guild.id, member.id)
+    played = wins + losses
+    win_rate = f"{wins / played * 100:.0f}%" if played else "N/A"
+
+    embed = discord.Embed(
+        title=f"{member.display_name}'s Tournament Stats",
+        color=0xffd700
+    )
+    embed.add_field(name="Wins", value=str(wins), inline=True)
+    embed.add_field(name="Losses", value=str(losses), inline=True)
+    embed.add_field(name="Win Rate", value=win_rate, inline=True)
+    embed.add_field(name="Podiums", value=str(podiums), inline=True)
+    embed.add_field(name="Titles", value=str(titles), inline=True)
+    embed.set_thumbnail(url=member.display_avatar.url)
+
+    await ctx.send(embed=embed)
+
+@bot.command()
+async def seeding(ctx, mode: str):
+    """Set how tournament brackets are seeded (random, sp or rating)"""
+    if not await is_staff(ctx):
+        await ctx.send("You don't have permission to use this command.")
+        return
+
+    mode = mode.lower()
+    if mode not in SEEDING_MODES:
+        await ctx.send(f"❌ Seeding mode must be one of: {', '.join(SEEDING_MODES)}")
+        return
+
+    get_guild_config(ctx.guild.id).update(seeding_mode=mode)
+
+    await ctx.send(f"✅ New tournaments will use **{mode}** seeding.")
+
+# Team Commands
+@bot.command()
+async def invite(ctx, member: discord.Member):
+    """Invite a player to form a 2v2 team"""
+    if member.id == ctx.author.id or member.bot:
+        await ctx.send("❌ You can't invite that user.")
+        return
+
+    if get_team_id(ctx.guild.id, ctx.author.id):
+        await ctx.send("❌ You are already in a team. Use `!leave_team` first.")
+        return
+
+    if get_team_id(ctx.guild.id, member.id):
+        await ctx.send(f"❌ {member.display_name} is already in a team.")
+        return
+
+    reap_team_invitations()
+    add_team_invitation(ctx.guild.id, member.id, ctx.author.id)
+
+    await ctx.send(
+        f"📨 {member.mention}, {ctx.author.display_name} invited you to a team! "
+        f"Use `!accept @{ctx.author.display_name}` within {TEAM_INVITE_TTL // 60} minutes."
+    )
+
+@bot.command()
+async def accept(ctx, member: discord.Member):
+    """Accept a team invitation"""
+    if not has_team_invitation(ctx.guild.id, ctx.author.id, member.id):
+        await ctx.send(f"❌ You don't have a pending invitation from {member.display_name}.")
+        return
+
+    if get_team_id(ctx.guild.id, ctx.author.id) or get_team_id(ctx.guild.id, member.id):
+        clear_team_invitations(ctx.guild.id, ctx.author.id)
+        await ctx.send("❌ One of you has already joined another team.")
+        return
+
+    create_team(ctx.guild.id, member.id, ctx.author.id)
+    clear_team_invitations(ctx.guild.id, ctx.author.id)
+    clear_team_invitations(ctx.guild.id, member.id)
+
+    team_name = get_team_display_name(ctx.guild, [member, ctx.author])
+    await ctx.send(f"✅ Team **{team_name}** has been created!")
+
+@bot.command()
+async def decline(ctx, member: discord.Member):
+    """Decline a team invitation"""
+    if not has_team_invitation(ctx.guild.id, ctx.author.id, member.id):
+        await ctx.send(f"❌ You don't have a pending invitation from {member.display_name}.")
+        return
+
+    del team_invitations[str(ctx.guild.id)][str(ctx.author.id)][str(member.id)]
+    await ctx.send(f"Invitation from {member.display_name} declined.")
+
+@bot.command()
+async def leave_team(ctx):
+    """Leave your current team"""
+    team_id = get_team_id(ctx.guild.id, ctx.author.id)
+    if not team_id:
+        await ctx.send("❌ You are not in a team.")
+        return
+
+    tournament = get_tournament(ctx.guild.id)
+    if any(player.id in get_team_member_ids(ctx.guild.id, team_id) for player in tournament.players):
+        await ctx.send("❌ Your team is registered in a tournament. Unregister first.")
+        return
+
+    remove_team(ctx.guild.id, team_id)
+    await ctx.send("✅ You left your team.")
+
+@bot.command()
+async def team(ctx, member: discord.Member = None):
+    """Show a player's team"""
+    if member is None:
+        member = ctx.author
+
+    team_id = get_team_id(ctx.guild.id, member.id)
+    if not team_id:
+        await ctx.send(f"{member.display_name} is not in a team.")
+        return
+
+    teammate = await get_teammate(ctx.guild, member.id)
+    teammate_name = teammate.display_name if teammate else "Unknown (left the server)"
+    await ctx.send(f"👥 {member.display_name}'s teammate: **{teammate_name}**")
+
 # Tournament Configuration Views and Modals
 class TournamentConfigModal(discord.ui.Modal, title="Tournament Configuration"):
     def __init__(self, target_channel):
@@ -1423,6 +3576,7 @@ class TournamentConfigModal(discord.ui.Modal, title="Tournament Configuration"):
         max_length=50
     )
 
+    @timed('view.tournament_config_modal')
     async def on_submit(self, interaction: discord.Interaction):
         try:
             # Validate target channel
@@ -1468,6 +3622,7 @@ class TournamentConfigModal(discord.ui.Modal, title="Tournament Configuration"):
         tournament.map = self.map_field.value
         tournament.abilities = self.abilities_field.value
         tournament.prize = self.prize_field.value
+        tournament.seeding = get_guild_config(interaction.guild.id).seeding_mode
         tournament.players = []
         tournament.eliminated = []
         tournament.active = False
@@ -1519,6 +3674,7 @@ class TournamentConfigView(discord.ui.View):
         self.target_channel = target_channel
 
     @discord.ui.button(label="Set Tournament", style=discord.ButtonStyle.primary, custom_id="set_tournament_config")
+    @timed('view.set_tournament_config')
     async def set_tournament(self, interaction: discord.Interaction, button: discord.ui.Button):
         try:
             # Use the channel where the interaction happened if no target channel is set
@@ -1548,6 +3704,7 @@ class TournamentView(discord.ui.View):
         return True
 
     @discord.ui.button(label="Register", style=discord.ButtonStyle.green, custom_id="tournament_register")
+    @timed('view.tournament_register')
     async def register_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         try:
             tournament = get_tournament(interaction.guild.id)
@@ -1565,8 +3722,11 @@ class TournamentView(discord.ui.View):
                     return await interaction.response.send_message("❌ You need to be in a team to register for 2v2 tournaments! Use `!invite @teammate` to create a team.", ephemeral=True)
 
                 # Check if team is already registered
-                team_members = get_team_members(interaction.guild.id, team_id)
-                if any(member in tournament.players for member in team_members):
+                team_members = await get_team_members(interaction.guild, team_id)
+                if len(team_members) < 2:
+                    return await interaction.response.send_message("❌ Your teammate is no longer in this server. Use `!leave_team` and invite someone else.", ephemeral=True)
+                team_participants = [Participant(member.id) for member in team_members]
+                if any(participant in tournament.players for participant in team_participants):
                     return await interaction.response.send_message("❌ Your team is already registered.", ephemeral=True)
 
                 # Check if tournament is full (max_players represents number of teams in 2v2)
@@ -1574,8 +3734,8 @@ class TournamentView(discord.ui.View):
                 if current_teams >= tournament.max_players:
                     return await interaction.response.send_message("❌ Tournament is full.", ephemeral=True)
 
-                tournament.players.extend(team_members)
-                team_name = get_team_display_name(interaction.guild.id, team_members)
+                tournament.players.extend(team_participants)
+                team_name = get_team_display_name(interaction.guild, team_members)
 
                 for item in self.children:
                     if hasattr(item, 'custom_id') and item.custom_id == "participant_count":
@@ -1587,14 +3747,15 @@ class TournamentView(discord.ui.View):
                 await interaction.followup.send(f"✅ Team {team_name} registered! ({len(tournament.players) // 2}/{tournament.max_players} teams)", ephemeral=True)
 
             else:  # 1v1 mode
-                if interaction.user in tournament.players:
+                participant = Participant(interaction.user.id)
+                if participant in tournament.players:
                     return await interaction.response.send_message("❌ You are already registered.", ephemeral=True)
 
                 # Check if there's space
                 if len(tournament.players) >= tournament.max_players:
                     return await interaction.response.send_message("❌ Tournament is full.", ephemeral=True)
 
-                tournament.players.append(interaction.user)
+                tournament.players.append(participant)
 
                 for item in self.children:
                     if hasattr(item, 'custom_id') and item.custom_id == "participant_count":
@@ -1615,6 +3776,7 @@ class TournamentView(discord.ui.View):
                 print(f"Failed to send error message: {follow_error}")
 
     @discord.ui.button(label="Unregister", style=discord.ButtonStyle.red, custom_id="tournament_unregister")
+    @timed('view.tournament_unregister')
     async def unregister_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         try:
             tournament = get_tournament(interaction.guild.id)
@@ -1629,16 +3791,16 @@ class TournamentView(discord.ui.View):
                 if not team_id:
                     return await interaction.response.send_message("❌ You are not in a team.", ephemeral=True)
 
-                team_members = get_team_members(interaction.guild.id, team_id)
-                if not any(member in tournament.players for member in team_members):
+                team_participants = [Participant(user_id) for user_id in get_team_member_ids(interaction.guild.id, team_id)]
+                if not any(participant in tournament.players for participant in team_participants):
                     return await interaction.response.send_message("❌ Your team is not registered.", ephemeral=True)
 
                 # Remove entire team
-                for member in team_members:
-                    if member in tournament.players:
-                        tournament.players.remove(member)
+                for participant in team_participants:
+                    if participant in tournament.players:
+                        tournament.players.remove(participant)
 
-                team_name = get_team_display_name(interaction.guild.id, team_members)
+                team_name = get_team_display_name(interaction.guild, team_participants)
 
                 for item in self.children:
                     if hasattr(item, 'custom_id') and item.custom_id == "participant_count":
@@ -1650,10 +3812,11 @@ class TournamentView(discord.ui.View):
                 await interaction.followup.send(f"✅ Team {team_name} unregistered! ({len(tournament.players) // 2}/{tournament.max_players} teams)", ephemeral=True)
 
             else:  # 1v1 mode
-                if interaction.user not in tournament.players:
+                participant = Participant(interaction.user.id)
+                if participant not in tournament.players:
                     return await interaction.response.send_message("❌ You are not registered.", ephemeral=True)
 
-                tournament.players.remove(interaction.user)
+                tournament.players.remove(participant)
 
                 for item in self.children:
                     if hasattr(item, 'custom_id') and item.custom_id == "participant_count":
@@ -1678,6 +3841,7 @@ class TournamentView(discord.ui.View):
         pass
 
     @discord.ui.button(label="🚀 Start Tournament", style=discord.ButtonStyle.primary, custom_id="start_tournament")
+    @timed('view.start_tournament')
     async def start_tournament(self, interaction: discord.Interaction, button: discord.ui.Button):
         try:
             tournament = get_tournament(interaction.guild.id)
@@ -1703,11 +3867,13 @@ class TournamentView(discord.ui.View):
 
             await interaction.response.send_message("🚀 Starting tournament...", ephemeral=True)
 
+            seeded = tournament.seeding != "random"
+
             # Auto-fill with bots to make even number
             if tournament.mode == "2v2":
                 current_teams = len(tournament.players) // 2
-                # Add bots one by one until we have an even number of teams
-                while current_teams % 2 != 0:
+                # Add bots one by one until we have an even number of teams (seeding fills its own byes)
+                while current_teams % 2 != 0 and not seeded:
                     # Create bot team
                     bot1_name = f"Bot{tournament.fake_count}"
                     bot1_id = 761557952975420886 + tournament.fake_count
@@ -1732,7 +3898,8 @@ class TournamentView(discord.ui.View):
 
                     team_id = get_team_id(interaction.guild.id, player.id)
                     if team_id:
-                        teammate = get_teammate(interaction.guild.id, player.id)
+                        teammate_ids = [user_id for user_id in get_team_member_ids(interaction.guild.id, team_id) if user_id != player.id]
+                        teammate = Participant(teammate_ids[0]) if teammate_ids else None
                         if teammate and teammate in tournament.players:
                             team_groups.append([player, teammate])
                             processed_players.add(player)
@@ -1752,12 +3919,25 @@ class TournamentView(discord.ui.View):
                     if i + 1 < len(fake_players):
                         team_groups.append([fake_players[i], fake_players[i+1]])
 
-                # Shuffle team order but keep teammates together
-                random.shuffle(team_groups)
+                if seeded:
+                    # Place teams into seed slots, bot teams take the byes
+                    team_groups = seed_bracket(
+                        interaction.guild.id, team_groups, tournament.seeding,
+                        lambda: [create_fake_player(tournament), create_fake_player(tournament)]
+                    )
+                else:
+                    # Shuffle team order but keep teammates together
+                    random.shuffle(team_groups)
                 tournament.players = []
                 for team in team_groups:
                     tournament.players.extend(team)
 
+            elif seeded:
+                # Place players into seed slots, bots take the byes
+                tournament.players = seed_bracket(
+                    interaction.guild.id, tournament.players, tournament.seeding,
+                    lambda: create_fake_player(tournament)
+                )
             else:
                 # Add bots one by one until we have an even number of players
                 while len(tournament.players) % 2 != 0:
@@ -1804,14 +3984,14 @@ class TournamentView(discord.ui.View):
                     guild_str = str(interaction.guild.id)
 
                     for player in team_a:
-                        player_name = get_player_display_name(player, interaction.guild.id)
+                        player_name = get_player_display_name(player, interaction.guild)
                         if guild_str in bracket_roles and str(player.id) in bracket_roles[guild_str] and not isinstance(player, FakePlayer):
                             emojis = ''.join(bracket_roles[guild_str][str(player.id)])
                             player_name = f"{player_name} {emojis}"
                         team_a_display.append(player_name)
 
                     for player in team_b:
-                        player_name = get_player_display_name(player, interaction.guild.id)
+                        player_name = get_player_display_name(player, interaction.guild)
                         if guild_str in bracket_roles and str(player.id) in bracket_roles[guild_str] and not isinstance(player, FakePlayer):
                             emojis = ''.join(bracket_roles[guild_str][str(player.id)])
                             player_name = f"{player_name} {emojis}"
@@ -1829,8 +4009,8 @@ class TournamentView(discord.ui.View):
                 for i, match in enumerate(current_round, 1):
                     a, b = match
                     # Get bracket names
-                    player_a = get_player_display_name(a, interaction.guild.id)
-                    player_b = get_player_display_name(b, interaction.guild.id)
+                    player_a = get_player_display_name(a, interaction.guild)
+                    player_b = get_player_display_name(b, interaction.guild)
 
                     guild_str = str(interaction.guild.id)
                     if guild_str in bracket_roles and str(a.id) in bracket_roles[guild_str] and not isinstance(a, FakePlayer):
@@ -1870,6 +4050,7 @@ class AccountLinkView(discord.ui.View):
         super().__init__(timeout=None)
 
     @discord.ui.button(label="🔗 Link Account", style=discord.ButtonStyle.primary, custom_id="link_account")
+    @timed('view.link_account')
     async def link_account(self, interaction: discord.Interaction, button: discord.ui.Button):
         modal = AccountLinkModal()
         await interaction.response.send_modal(modal)
@@ -1884,6 +4065,7 @@ class AccountLinkModal(discord.ui.Modal, title="Link Your Account"):
         max_length=50
     )
 
+    @timed('view.account_link_modal')
     async def on_submit(self, interaction: discord.Interaction):
         user_accounts = load_json('user_accounts.json')
         key = f"{interaction.guild.id}_{interaction.user.id}"
@@ -1900,9 +4082,7 @@ class AccountLinkModal(discord.ui.Modal, title="Link Your Account"):
         await update_logs_message(interaction.guild.id)
         
         # Give verified role if configured
-        guild_config = load_json('guild_config.json')
-        config = guild_config.get(str(interaction.guild.id), {})
-        verified_role_id = config.get('verified_role')
+        verified_role_id = get_guild_config(interaction.guild.id).verified_role
         
         if verified_role_id:
             role = interaction.guild.get_role(verified_role_id)
@@ -1925,6 +4105,7 @@ class HosterRegistrationView(discord.ui.View):
         return True
 
     @discord.ui.button(label="Register", style=discord.ButtonStyle.green, custom_id="hoster_register")
+    @timed('view.hoster_register')
     async def register_hoster(self, interaction: discord.Interaction, button: discord.ui.Button):
         if not host_registrations['active']:
             return await interaction.response.send_message("❌ Hoster registration is not active.", ephemeral=True)
@@ -2018,6 +4199,7 @@ async def winner(ctx, member: discord.Member):
         return await ctx.send("❌ No active tournament.", delete_after=5)
 
     current_round = tournament.rounds[-1]
+    participant = Participant(member.id)
 
     # Find and update the match
     match_found = False
@@ -2032,11 +4214,11 @@ async def winner(ctx, member: discord.Member):
         if not member_team_id:
             return await ctx.send("❌ This player is not in a team.", delete_after=5)
 
-        member_team = get_team_members(ctx.guild.id, member_team_id)
-
         for i, match in enumerate(current_round):
             team_a, team_b = match
-            if member in team_a:
+            if (participant in team_a or participant in team_b) and (team_a in tournament.results or team_b in tournament.results):
+                return await ctx.send("❌ This match already has a result.", delete_after=5)
+            if participant in team_a:
                 winner_team = team_a
                 loser_team = team_b
                 tournament.results.append(team_a)
@@ -2044,7 +4226,7 @@ async def winner(ctx, member: discord.Member):
                 match_found = True
                 match_index = i
                 break
-            elif member in team_b:
+            elif participant in team_b:
                 winner_team = team_b
                 loser_team = team_a
                 tournament.results.append(team_b)
@@ -2054,26 +4236,46 @@ async def winner(ctx, member: discord.Member):
                 break
 
         if match_found:
-            winner_name = get_team_display_name(ctx.guild.id, winner_team)
+            winner_name = get_team_display_name(ctx.guild, winner_team)
 
     else:  # 1v1 mode
         for i, match in enumerate(current_round):
             a, b = match
-            if member == a or member == b:
-                tournament.results.append(member)
-                eliminated_players.extend([a if member == b else b])
+            if participant == a or participant == b:
+                if a in tournament.results or b in tournament.results:
+                    return await ctx.send("❌ This match already has a result.", delete_after=5)
+                winner_player = a if participant == a else b
+                tournament.results.append(winner_player)
+                eliminated_players.extend([b if participant == a else a])
                 match_found = True
                 match_index = i
                 break
 
         if match_found:
-            winner_name = get_player_display_name(member, ctx.guild.id)
+            winner_name = get_player_display_name(member, ctx.guild)
 
     if not match_found:
         return await ctx.send("❌ This player/team is not in the current round.", delete_after=5)
 
-    # Add eliminated players to elimination list
-    tournament.eliminated.extend(eliminated_players)
+    # Add eliminated entrants to elimination list, a 2v2 team is eliminated as one entrant
+    if tournament.mode == "2v2":
+        tournament.eliminated.append(loser_team)
+    else:
+        tournament.eliminated.extend(eliminated_players)
+
+    # Update ratings and player aggregates for this match
+    if tournament.mode == "2v2":
+        match_winners, match_losers = winner_team, loser_team
+    else:
+        match_winners, match_losers = [winner_player], eliminated_players
+    record_match_rating(ctx.guild.id, match_winners, match_losers)
+    record_match_stats(ctx.guild.id, match_winners, match_losers)
+    tournament.match_log.append([
+        len(tournament.rounds),
+        [player.id for player in match_winners],
+        [player.id for player in match_losers]
+    ])
+    save_data()
 
     # Update current tournament message to show the winner
     if tournament.message:
@@ -2086,10 +4288,11 @@ async def winner(ctx, member: discord.Member):
                 if "Match" in field.name:
                     field_value = field.value
                     lines = field_value.split('\n')
-                    lines[1] = f"<:Crown:1409926966236283012> Winner: **{get_player_display_name(member, ctx.guild.id)}**"
+                    lines[1] = f"<:Crown:1409926966236283012> Winner: **{get_player_display_name(member, ctx.guild)}**"
 
                     current_embed.set_field_at(match_index, name=field.name, value='\n'.join(lines), inline=field.inline)
-                    await tournament.message.edit(embed=current_embed)
+                    # edit() returns the updated message, keep it so the next winner builds on this one
+                    tournament.message = await tournament.message.edit(embed=current_embed)
 
         except Exception as e:
             print(f"Error updating tournament message: {e}")
@@ -2108,30 +4311,25 @@ async def winner(ctx, member: discord.Member):
 
             # 1st place (winner)
             placements.append((1, winner_data, 3))
-            if hasattr(winner_data, 'id') and not isinstance(winner_data, FakePlayer):
-                add_sp(ctx.guild.id, winner_data.id, 3)
 
             # 2nd place (last eliminated)
             if len(all_eliminated) >= 1:
                 placements.append((2, all_eliminated[-1], 2))
-                player = all_eliminated[-1]
-                if hasattr(player, 'id') and not isinstance(player, FakePlayer):
-                    add_sp(ctx.guild.id, player.id, 2)
 
-            # 3rd and 4th place
+            # 3rd and 4th place (semifinal losers)
             if len(all_eliminated) >= 2:
                 placements.append((3, all_eliminated[-2], 1))
-                player = all_eliminated[-2]
-                if hasattr(player, 'id') and not isinstance(player, FakePlayer):
-                    add_sp(ctx.guild.id, player.id, 1)
             if len(all_eliminated) >= 3:
                 placements.append((4, all_eliminated[-3], 1))
-                player = all_eliminated[-3]
-                if hasattr(player, 'id') and not isinstance(player, FakePlayer):
-                    add_sp(ctx.guild.id, player.id, 1)
+
+            # Every real member of a placed entrant gets the SP
+            for place, entrant, sp in placements:
+                for player in (entrant if isinstance(entrant, list) else [entrant]):
+                    if hasattr(player, 'id') and not isinstance(player, FakePlayer):
+                        add_sp(ctx.guild.id, player.id, sp)
 
             # Create styled tournament winners embed
-            winner_display = get_player_display_name(winner_data, ctx.guild.id)
+            winner_display = get_player_display_name(winner_data, ctx.guild)
 
             embed = discord.Embed(
                 title="🏆 Tournament Winners!",
@@ -2158,7 +4356,7 @@ async def winner(ctx, member: discord.Member):
                 else:
                     emoji = "📍"
 
-                player_str = get_player_display_name(player_obj, ctx.guild.id)
+                player_str = get_player_display_name(player_obj, ctx.guild)
                 results_display += f"{emoji} {player_str}\n"
 
             embed.add_field(name="🏆 Final Rankings", value=results_display, inline=False)
@@ -2183,9 +4381,10 @@ async def winner(ctx, member: discord.Member):
             embed.add_field(name="🏆 Prizes", value=prize_text, inline=False)
 
             # Add winner's avatar if it's a real player
-            winner_player_obj = winner_data
-            if hasattr(winner_player_obj, 'display_avatar') and not isinstance(winner_player_obj, FakePlayer):
-                embed.set_thumbnail(url=winner_player_obj.display_avatar.url)
+            if isinstance(winner_data, Participant) and not isinstance(winner_data, FakePlayer):
+                winner_member = await resolve_member(ctx.guild, winner_data.id)
+                if winner_member:
+                    embed.set_thumbnail(url=winner_member.display_avatar.url)
 
             # Add footer with tournament ID and timestamp
             embed.set_footer(text=f"Tournament completed • {datetime.now().strftime('%d.%m.%Y %H:%M')}")
@@ -2194,14 +4393,30 @@ async def winner(ctx, member: discord.Member):
             completed_view = discord.ui.View()
             await ctx.send(embed=embed, view=completed_view)
 
+            # Archive the bracket before it is discarded
+            archive_tournament(ctx.guild.id, tournament, placements)
+            save_data()
+
             # Reset tournament
             tournament.__init__()
         else:
             # Create next round
             next_round_winners = tournament.results.copy()
 
+            # Seeded brackets advance in match order so slots keep their bracket position
+            if tournament.seeding != "random":
+                match_slots = {}
+                for i, match in enumerate(current_round):
+                    for entrant in match:
+                        match_slots[get_entrant_key(entrant)] = i
+                next_round_winners.sort(key=lambda entrant: match_slots.get(get_entrant_key(entrant), len(current_round)))
+
             # Add fake players if odd number of winners
             while len(next_round_winners) % 2 != 0:
+                if tournament.mode == "2v2":
+                    # Winners are teams here, so the filler has to be a bot team
+                    next_round_winners.append([create_fake_player(tournament), create_fake_player(tournament)])
+                    continue
                 bot_name = f"Bot{tournament.fake_count}"
                 bot_id = 761557952975420886 + tournament.fake_count
                 bot = FakePlayer(bot_name, bot_id)
@@ -2232,14 +4447,14 @@ async def winner(ctx, member: discord.Member):
                     guild_str = str(ctx.guild.id)
 
                     for player in team_a:
-                        player_name = get_player_display_name(player, ctx.guild.id)
+                        player_name = get_player_display_name(player, ctx.guild)
                         if guild_str in bracket_roles and str(player.id) in bracket_roles[guild_str] and not isinstance(player, FakePlayer):
                             emojis = ''.join(bracket_roles[guild_str][str(player.id)])
                             player_name = f"{player_name} {emojis}"
                         team_a_display.append(player_name)
 
                     for player in team_b:
-                        player_name = get_player_display_name(player, ctx.guild.id)
+                        player_name = get_player_display_name(player, ctx.guild)
                         if guild_str in bracket_roles and str(player.id) in bracket_roles[guild_str] and not isinstance(player, FakePlayer):
                             emojis = ''.join(bracket_roles[guild_str][str(player.id)])
                             player_name = f"{player_name} {emojis}"
@@ -2257,8 +4472,8 @@ async def winner(ctx, member: discord.Member):
                 for i, match in enumerate(next_round_pairs, 1):
                     a, b = match
                     # Get bracket names WITH emojis for next rounds
-                    player_a = get_player_display_name(a, ctx.guild.id)
-                    player_b = get_player_display_name(b, ctx.guild.id)
+                    player_a = get_player_display_name(a, ctx.guild)
+                    player_b = get_player_display_name(b, ctx.guild)
 
                     guild_str = str(ctx.guild.id)
                     if guild_str in bracket_roles and str(a.id) in bracket_roles[guild_str] and not isinstance(a, FakePlayer):
@@ -2296,18 +4511,34 @@ async def spu(ctx, *roles: discord.Role):
     
     role_ids = ','.join(str(role.id) for role in roles)
     
-    guild_config = load_json('guild_config.json')
-    guild_id = str(ctx.guild.id)
-    
-    if guild_id not in guild_config:
-        guild_config[guild_id] = {}
-    
-    guild_config[guild_id]['staff_roles'] = role_ids
-    save_json('guild_config.json', guild_config)
+    get_guild_config(ctx.guild.id).update(staff_roles=role_ids)
     
     role_mentions = ', '.join(role.mention for role in roles)
     await ctx.send(f"Staff roles updated! These roles can now use ALL bot commands: {role_mentions}")
 
+@bot.command()
+async def roleperm(ctx, permission_type: str, *roles: discord.Role):
+    """Set the roles for a tournament permission type (htr, adr or tlr)"""
+    if not ctx.author.guild_permissions.administrator:
+        await ctx.send("You need administrator permission to use this command.")
+        return
+
+    permission_type = permission_type.lower()
+    if permission_type not in PERMISSION_TYPES:
+        await ctx.send(f"Permission type must be one of: {', '.join(PERMISSION_TYPES)}")
+        return
+
+    guild_str = str(ctx.guild.id)
+    if guild_str not in role_permissions:
+        role_permissions[guild_str] = {}
+
+    role_permissions[guild_str][permission_type] = [role.id for role in roles]
+    save_data()
+    invalidate_permission_cache(ctx.guild.id)
+
+    role_mentions = ', '.join(role.mention for role in roles) if roles else 'None'
+    await ctx.send(f"**{permission_type.upper()}** roles updated: {role_mentions}")
+
 @bot.command()
 async def verified_role(ctx, role: discord.Role):
     """Set the role to give users when they link their account"""
@@ -2315,14 +4546,7 @@ async def verified_role(ctx, role: discord.Role):
         await ctx.send("You need administrator permission to use this command.")
         return
     
-    guild_config = load_json('guild_config.json')
-    guild_id = str(ctx.guild.id)
-    
-    if guild_id not in guild_config:
-        guild_config[guild_id] = {}
-    
-    guild_config[guild_id]['verified_role'] = role.id
-    save_json('guild_config.json', guild_config)
+    get_guild_config(ctx.guild.id).update(verified_role=role.id)
     
     await ctx.send(f"Verified role set to {role.mention}! Users will receive this role when they link their account.")
 
@@ -2336,32 +4560,53 @@ async def level_check():
     if not isinstance(user_levels, dict) or not isinstance(level_roles, dict):
         return
     
+    # Group levels by guild so each shard's guilds are processed together
+    levels_by_guild = {}
     for key, user_data in user_levels.items():
         guild_id, user_id = key.split('_')
-        user_level = user_data.get('level', 0)
-        
-        guild = bot.get_guild(int(guild_id))
-        if not guild:
-            continue
-        
-        member = guild.get_member(int(user_id))
-        if not member:
-            continue
+        levels_by_guild.setdefault(guild_id, []).append((int(user_id), user_data.get('level', 0)))
+    
+    for shard_guilds in guilds_by_shard().values():
+        for guild in shard_guilds:
+            guild_id = str(guild.id)
+            guild_roles = level_roles.get(guild_id, {})
+            if not guild_roles:
+                continue
+            
+            min_level = min(int(level_num) for level_num in guild_roles)
+            holders = [(user_id, user_level) for user_id, user_level in levels_by_guild.get(guild_id, []) if user_level >= min_level]
+            if MEMBER_CACHE_MODE != 'full':
+                # Members who reached a level role after prepare_member_cache ran aren't cached yet
+                try:
+                    await cache_members(guild, [user_id for user_id, _ in holders])
+                except (discord.HTTPException, asyncio.TimeoutError) as e:
+                    print(f"Error loading level holders for {guild.name}: {e}")
+            for user_id, user_level in holders:
+                member = guild.get_member(user_id)
+                if not member:
+                    continue
+                
+                for level_num, role_ids in guild_roles.items():
+                    if user_level >= int(level_num):
+                        for role_id in role_ids:
+                            role = guild.get_role(int(role_id))
+                            if role and role not in member.roles:
+                                try:
+                                    await member.add_roles(role, reason="Level role assignment")
+                                except:
+                                    pass
         
-        guild_roles = level_roles.get(guild_id, {})
-        for level_num, role_ids in guild_roles.items():
-            if user_level >= int(level_num):
-                for role_id in role_ids:
-                    role = guild.get_role(int(role_id))
-                    if role and role not in member.roles:
-                        try:
-                            await member.add_roles(role, reason="Level role assignment")
-                        except:
-                            pass
+        # Let other shards' events run between partitions
+        await asyncio.sleep(0)
+
+@level_check.before_loop
+async def before_level_check():
+    await bot.wait_until_ready()
 
 # Error handling
 @bot.event
 async def on_command_error(ctx, error):
+    bump_counter(f"command_error.{type(error).__name__}")
     if isinstance(error, commands.MemberNotFound):
         await ctx.send("User not found.")
     elif isinstance(error, commands.MissingRequiredArgument):
@@ -2377,5 +4622,10 @@ if __name__ == "__main__":
     if not TOKEN:
         print("Please set the TOKEN environment variable")
     else:
-        keep_alive()
-        bot.run(TOKEN)
+        async def main():
+            # The health server (started in setup_hook) shares the bot's event loop instead of running in its own thread
+            discord.utils.setup_logging()
+            async with bot:
+                await bot.start(TOKEN)
+
+        asyncio.run(main())
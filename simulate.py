@@ -0,0 +1,387 @@
+"""Offline tournament simulator and benchmark harness.
+
+Runs complete tournaments through the real registration, start and !winner
+code paths in main.py using stand-in interaction and context objects, so no
+Discord connection is needed. Reports throughput, per-operation latency and
+memory use, and checks bracket invariants along the way.
+
+Usage: python simulate.py --count 1000 --mode both --seeding random sp rating
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import main
+
+GUILD_ID = 100000000000000001
+HOST_ID = 100000000000000002
+
+
+# Stand-in Discord objects
+class StubPermissions:
+    def __init__(self, staff=False):
+        self.manage_channels = staff
+        self.manage_messages = staff
+        self.administrator = staff
+
+
+class StubAvatar:
+    url = "https://cdn.discordapp.com/embed/avatars/0.png"
+
+
+class StubMember:
+    def __init__(self, user_id, name, staff=False):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.nick = None
+        self.mention = f"<@{user_id}>"
+        self.bot = False
+        self.roles = []
+        self.guild_permissions = StubPermissions(staff)
+        self.display_avatar = StubAvatar()
+
+    # discord.Member compares and hashes by id
+    def __eq__(self, other):
+        return getattr(other, 'id', None) == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __str__(self):
+        return self.name
+
+
+class StubMessage:
+    def __init__(self, content=None, embed=None):
+        self.content = content
+        self.embeds = [embed] if embed else []
+        self.id = random.getrandbits(62)
+
+    async def edit(self, embed=None, **kwargs):
+        if embed:
+            self.embeds = [embed]
+
+    async def delete(self):
+        pass
+
+
+class StubChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.mention = f"<#{channel_id}>"
+        self.sent = []
+
+    async def send(self, content=None, embed=None, view=None, delete_after=None, **kwargs):
+        message = StubMessage(content, embed)
+        self.sent.append(message)
+        return message
+
+
+class StubGuild:
+    def __init__(self, guild_id, members):
+        self.id = guild_id
+        self.name = "Simulator"
+        self.members = members
+        self._members = {member.id: member for member in members}
+
+    def get_member(self, user_id):
+        return self._members.get(user_id)
+
+
+class StubResponse:
+    def __init__(self):
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def send_message(self, *args, **kwargs):
+        self._done = True
+
+    async def edit_message(self, *args, **kwargs):
+        self._done = True
+
+    async def send_modal(self, modal):
+        self._done = True
+
+
+class StubFollowup:
+    async def send(self, *args, **kwargs):
+        pass
+
+
+class StubInteraction:
+    def __init__(self, guild, user, channel):
+        self.guild = guild
+        self.user = user
+        self.channel = channel
+        self.response = StubResponse()
+        self.followup = StubFollowup()
+
+
+class StubContext:
+    def __init__(self, guild, author, channel):
+        self.guild = guild
+        self.author = author
+        self.channel = channel
+        self.message = StubMessage()
+
+    async def send(self, content=None, embed=None, view=None, delete_after=None, **kwargs):
+        return await self.channel.send(content, embed=embed, view=view)
+
+
+# Benchmark bookkeeping
+class Timings:
+    def __init__(self):
+        self.samples = {}
+
+        self.state_sizes = {}
+
+    def add(self, operation, seconds):
+        self.samples.setdefault(operation, []).append(seconds)
+
+    def add_size(self, entrants, size):
+        self.state_sizes.setdefault(entrants, []).append(size)
+
+    def report(self):
+        lines = []
+        for operation, samples in sorted(self.samples.items()):
+            samples.sort()
+            count = len(samples)
+
+            def pct(p):
+                return samples[min(count - 1, int(count * p))] * 1000
+
+            lines.append(
+                f"  {operation:<10} n={count:<7} p50={pct(0.50):.3f}ms p95={pct(0.95):.3f}ms "
+                f"p99={pct(0.99):.3f}ms max={samples[-1] * 1000:.3f}ms"
+            )
+        return "\n".join(lines)
+
+    def report_sizes(self):
+        return "\n".join(
+            f"  {entrants:>3} entrants: {sum(sizes) / len(sizes) / 1024:.1f} KiB"
+            for entrants, sizes in sorted(self.state_sizes.items())
+        )
+
+
+class InvariantError(Exception):
+    pass
+
+
+def check(condition, message):
+    if not condition:
+        raise InvariantError(message)
+
+
+async def timed(timings, operation, coro):
+    start = time.perf_counter()
+    await coro
+    timings.add(operation, time.perf_counter() - start)
+
+
+def bracket_state_size(tournament):
+    """Bytes held by the bracket's participant state"""
+    return main.deep_sizeof([tournament.players, tournament.rounds, tournament.results, tournament.eliminated])
+
+
+def entrant_ids(entrant):
+    return tuple(main.get_entrant_ids(entrant))
+
+
+def is_bot_side(entrant):
+    members = entrant if isinstance(entrant, list) else [entrant]
+    return all(isinstance(player, main.FakePlayer) for player in members)
+
+
+async def configure(guild, host, channel, mode, max_players):
+    """Submit the tournament config modal with the given values"""
+    modal = main.TournamentConfigModal(channel)
+    values = {
+        'title_field': "Simulated Cup",
+        'map_field': "Block Dash",
+        'abilities_field': "All",
+        'mode_and_players_field': f"{mode} {max_players}",
+        'prize_field': "Glory",
+    }
+    for name, value in values.items():
+        # Same hook discord.py uses to fill in submitted modal values
+        getattr(modal, name)._refresh_state(None, {'value': value})
+    await modal.on_submit(StubInteraction(guild, host, channel))
+
+
+async def run_tournament(guild, host, channel, players, team_leaders, mode, timings):
+    """Run one tournament from registration to final result, checking invariants"""
+    max_players = random.choice([2, 4, 8, 16] if mode == "2v2" else [2, 4, 8, 16, 32])
+    await timed(timings, "configure", configure(guild, host, channel, mode, max_players))
+
+    tournament = main.get_tournament(guild.id)
+    view = main.TournamentView()
+
+    pool = team_leaders if mode == "2v2" else players
+    entrants = random.sample(pool, random.randint(1, min(max_players, len(pool))))
+    for user in entrants:
+        await timed(timings, "register", view.register_button.callback(StubInteraction(guild, user, channel)))
+
+    registered = [player.id for player in tournament.players]
+    check(len(registered) == len(set(registered)), f"duplicate registrations: {registered}")
+
+    await timed(timings, "start", view.start_tournament.callback(StubInteraction(guild, host, channel)))
+    check(tournament.active, "tournament did not start")
+    timings.add_size(len(tournament.players), bracket_state_size(tournament))
+
+    first_round = [player_id for match in tournament.rounds[0] for side in match for player_id in entrant_ids(side)]
+    check(len(first_round) == len(set(first_round)), f"duplicate entrants in round 1: {first_round}")
+    check(set(registered) <= set(first_round), "registered player missing from round 1")
+
+    matches = 0
+    final_winner = final_loser = None
+    losers_by_round = []
+    while tournament.active:
+        round_number = len(tournament.rounds)
+        current_round = list(tournament.rounds[-1])
+        round_winners = []
+        losers_by_round.append([])
+
+        for side_a, side_b in current_round:
+            # Bots can't be mentioned, so a real side always beats a bot side
+            a_is_bot = is_bot_side(side_a)
+            b_is_bot = is_bot_side(side_b)
+            if a_is_bot != b_is_bot:
+                winner, loser = (side_b, side_a) if a_is_bot else (side_a, side_b)
+            else:
+                winner, loser = random.choice([(side_a, side_b), (side_b, side_a)])
+
+            reported = winner[0] if isinstance(winner, list) else winner
+            reported_before = len(tournament.match_log)
+            ctx = StubContext(guild, host, channel)
+            await timed(timings, "winner", main.winner.callback(ctx, reported))
+            matches += 1
+            check(not tournament.active or len(tournament.match_log) == reported_before + 1,
+                  f"result for {entrant_ids(winner)} in round {round_number} was not recorded")
+            if tournament.active and len(tournament.rounds) == round_number:
+                # A second report for the same match must be rejected without touching ratings or stats
+                await main.winner.callback(StubContext(guild, host, channel), reported)
+                check(len(tournament.match_log) == reported_before + 1,
+                      f"duplicate result for {entrant_ids(winner)} in round {round_number} was recorded")
+            round_winners.append(entrant_ids(winner))
+            losers_by_round[-1].append(entrant_ids(loser))
+            final_winner, final_loser = winner, loser
+
+        if tournament.active:
+            check(len(tournament.rounds) == round_number + 1, f"round {round_number} did not advance")
+            next_entrants = [entrant_ids(side) for match in tournament.rounds[-1] for side in match]
+            for winner_ids in round_winners:
+                check(winner_ids in next_entrants, f"winner {winner_ids} missing from round {round_number + 1}")
+
+    with open(main.HISTORY_FILE) as f:
+        record = json.loads(f.readlines()[-1])
+
+    check(len(record['matches']) == matches, "archive match count mismatch")
+    placements = {place: ids for place, ids in record['placements']}
+    check(tuple(placements[1]) == entrant_ids(final_winner), "1st place is not the final winner")
+    if 2 in placements:
+        check(tuple(placements[2]) == entrant_ids(final_loser), "2nd place is not the whole final losing entrant")
+    if len(losers_by_round) >= 2:
+        semifinal_losers = set(losers_by_round[-2])
+        placed = {tuple(placements[place]) for place in (3, 4) if place in placements}
+        check(placed == semifinal_losers, f"3rd/4th places {placed} are not the semifinal losers {semifinal_losers}")
+
+    return matches
+
+
+def setup_players(count):
+    players = [StubMember(200000000000000000 + i, f"Player{i}") for i in range(count)]
+    host = StubMember(HOST_ID, "Host", staff=True)
+    guild = StubGuild(GUILD_ID, players + [host])
+
+    # Pair everyone into 2v2 teams, the first member of each team registers it
+    team_leaders = []
+    for i in range(0, count - 1, 2):
+        main.create_team(guild.id, players[i].id, players[i + 1].id)
+        team_leaders.append(players[i])
+
+    return guild, host, players, team_leaders
+
+
+def set_seeding(mode):
+    config = main.get_guild_config(GUILD_ID)
+    if config.seeding_mode != mode:
+        config.update(seeding_mode=mode)
+
+
+async def simulate(args):
+    random.seed(args.seed)
+    modes = ["1v1", "2v2"] if args.mode == "both" else [args.mode]
+
+    main.init_db()
+    guild, host, players, team_leaders = setup_players(args.players)
+    channel = StubChannel(300000000000000000)
+    timings = Timings()
+
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+
+    total_matches = 0
+    failures = 0
+    for i in range(args.count):
+        mode = random.choice(modes)
+        set_seeding(random.choice(args.seeding))
+        # Handlers report their own failures with print(), so capture them as invariant violations
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                total_matches += await run_tournament(guild, host, channel, players, team_leaders, mode, timings)
+            errors = [line for line in output.getvalue().splitlines() if "Error" in line]
+            check(not errors, f"handler errors: {errors}")
+        except InvariantError as e:
+            failures += 1
+            print(f"❌ Tournament {i + 1} ({mode}): {e}")
+            main.get_tournament(guild.id).__init__()
+        channel.sent.clear()
+
+    # Let fire-and-forget tasks (logs board refreshes) finish
+    await asyncio.sleep(0)
+
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    retained = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, 'filename'))
+    tracemalloc.stop()
+
+    print(f"Tournaments: {args.count} ({failures} failed invariants), matches: {total_matches}")
+    print(f"Throughput: {args.count / elapsed:.1f} tournaments/s, {total_matches / elapsed:.1f} matches/s")
+    print("Latency:")
+    print(timings.report())
+    print("Bracket state per tournament after round 1 is built:")
+    print(timings.report_sizes())
+    print(f"Memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB, retained {retained / 1024:.1f} KiB")
+
+    return failures
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run offline tournament simulations")
+    parser.add_argument('--count', type=int, default=1000, help="number of tournaments to run")
+    parser.add_argument('--mode', choices=['1v1', '2v2', 'both'], default='both')
+    parser.add_argument('--seeding', nargs='+', choices=main.SEEDING_MODES, default=main.SEEDING_MODES)
+    parser.add_argument('--players', type=int, default=64, help="size of the simulated player pool")
+    parser.add_argument('--seed', type=int, default=1, help="random seed")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    # Run in a scratch directory so the JSON database files don't touch the real ones
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        failed = asyncio.run(simulate(arguments))
+    raise SystemExit(1 if failed else 0)